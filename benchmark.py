@@ -0,0 +1,390 @@
+import argparse
+import csv
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Reproducible benchmarks for the conversion functions. Inputs are generated from a seeded
+# random stream, so the same --seed and size always produce byte-identical files, and each
+# measurement runs in a fresh process so its peak RSS belongs to that case alone (worker
+# processes it starts are reported separately, as worker_peak_rss_mb).
+
+DEFAULT_SIZES_MB = [10]
+DEFAULT_SEED = 0
+DEFAULT_THRESHOLD = 0.10
+RESULTS_VERSION = 1
+WIDE_COLUMNS = 200
+MERGE_FILES = 4
+GENERATED_AT = datetime.datetime(2000, 1, 1)
+
+WORDS = ['alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india', 'juliett', 'kilo', 'lima']
+STATUSES = ['ACTIVE', 'INACTIVE', 'PENDING', 'CLOSED']
+
+def _text(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+
+def _tall_row(rng, index):
+    return [
+        index, rng.randint(0, 10 ** 6), round(rng.uniform(-1000, 1000), 4), rng.choice(STATUSES), _text(rng),
+        f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", rng.randint(0, 1), _text(rng), rng.random(), f"C{rng.randint(0, 99999):05d}",
+    ]
+
+def _wide_row(rng, index):
+    return [index] + [rng.randint(0, 9999) if column % 3 else _text(rng) for column in range(1, WIDE_COLUMNS)]
+
+def _dirty_value(rng):
+    # Delimiters, doubled quotes and line breaks inside quoted fields
+    choice = rng.random()
+    if choice < 0.1:
+        return f"{_text(rng)}, {_text(rng)}"
+    if choice < 0.15:
+        return f'he said "{rng.choice(WORDS)}"'
+    if choice < 0.2:
+        return f"{_text(rng)}\n{_text(rng)}"
+    return _text(rng)
+
+class _SizedWriter:
+    # Counts the bytes written so generators can stop at the requested size
+    def __init__(self, f):
+        self.f = f
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(text)
+        return self.f.write(text)
+
+def _write_csv(path, header, make_row, target_bytes, rng):
+    rows = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        sized = _SizedWriter(f)
+        writer = csv.writer(sized)
+        writer.writerow(header)
+        while sized.size < target_bytes:
+            writer.writerow(make_row(rng, rows))
+            rows += 1
+    return rows
+
+def generate_csv_tall(directory, target_bytes, rng):
+    path = os.path.join(directory, 'tall.csv')
+    header = ['id', 'amount', 'price', 'status', 'description', 'date', 'flag', 'notes', 'score', 'customer']
+    return [path], _write_csv(path, header, _tall_row, target_bytes, rng)
+
+def generate_csv_wide(directory, target_bytes, rng):
+    path = os.path.join(directory, 'wide.csv')
+    header = [f"col_{column}" for column in range(WIDE_COLUMNS)]
+    return [path], _write_csv(path, header, _wide_row, target_bytes, rng)
+
+def generate_csv_dirty(directory, target_bytes, rng):
+    path = os.path.join(directory, 'dirty.csv')
+    header = ['id', 'name', 'comment', 'status', 'amount']
+
+    def make_row(rng, index):
+        row = [index, _dirty_value(rng), _dirty_value(rng), rng.choice(STATUSES), rng.randint(0, 10 ** 6)]
+        if rng.random() < 0.001:
+            row.append('stray field')  # Malformed row that goes to the rejects file
+        return row
+
+    return [path], _write_csv(path, header, make_row, target_bytes, rng)
+
+def generate_jsonl_nested(directory, target_bytes, rng):
+    path = os.path.join(directory, 'nested.jsonl')
+    rows = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        sized = _SizedWriter(f)
+        while sized.size < target_bytes:
+            record = {
+                'id': rows,
+                'status': rng.choice(STATUSES),
+                'customer': {'id': f"C{rng.randint(0, 99999):05d}", 'name': _text(rng), 'address': {'city': rng.choice(WORDS), 'zip': rng.randint(10000, 99999)}},
+                'amount': round(rng.uniform(0, 5000), 2),
+                'tags': [rng.choice(WORDS) for _ in range(rng.randint(0, 3))],
+            }
+            if rng.random() < 0.1:
+                record['discount'] = {'code': rng.choice(WORDS), 'rate': rng.random()}
+            sized.write(json.dumps(record) + '\n')
+            rows += 1
+    return [path], rows
+
+def generate_excel_tall(directory, target_bytes, rng):
+    import xlsxwriter
+
+    # Sized by the CSV text the rows would take, the zipped workbook is smaller on disk
+    path = os.path.join(directory, 'tall.xlsx')
+    header = ['id', 'amount', 'price', 'status', 'description', 'date', 'flag', 'notes', 'score', 'customer']
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'use_zip64': True})
+    # xlsxwriter stamps the current time into docProps/core.xml unless told otherwise
+    workbook.set_properties({'created': GENERATED_AT})
+    rows, size, sheet = 0, 0, None
+    while size < target_bytes:
+        if rows % (1048576 - 1) == 0:
+            sheet = workbook.add_worksheet(f"Sheet{rows // (1048576 - 1) + 1}") if sheet else workbook.add_worksheet()
+            sheet.write_row(0, 0, header)
+        row = _tall_row(rng, rows)
+        sheet.write_row(rows % (1048576 - 1) + 1, 0, row)
+        size += sum(len(str(value)) + 1 for value in row)
+        rows += 1
+    workbook.close()
+    return [path], rows
+
+def generate_merge_inputs(directory, target_bytes, rng):
+    # Files whose headers overlap partially, so the merge has to build a header union
+    header = ['id', 'amount', 'price', 'status', 'description', 'date', 'flag', 'notes', 'score', 'customer']
+    paths, rows = [], 0
+    for part in range(MERGE_FILES):
+        columns = header[:6] + header[6 + part % 4:] if part else header
+        positions = [header.index(column) for column in columns]
+        path = os.path.join(directory, f"merge_{part}.csv")
+
+        def make_row(rng, index, positions=positions, offset=rows):
+            row = _tall_row(rng, offset + index)
+            return [row[position] for position in positions]
+
+        rows += _write_csv(path, columns, make_row, target_bytes // MERGE_FILES, rng)
+        paths.append(path)
+    return paths, rows
+
+def run_convert_csv_to_excel(inputs, output_dir):
+    from functions import convert_csv_to_excel
+    convert_csv_to_excel(inputs[0], os.path.join(output_dir, 'out.xlsx'), [], ',', '"')
+
+def run_convert_csv_to_parquet(inputs, output_dir, parse_workers=1):
+    from functions import convert_to_columnar
+    convert_to_columnar(inputs[0], os.path.join(output_dir, 'out.parquet'), None, 'CSV', 'Parquet', None, ',', '"', parse_workers=parse_workers)
+
+def run_convert_csv_to_parquet_parallel(inputs, output_dir):
+    # Same as csv_tall_to_parquet with the blocks parsed on every core, the ratio shows the scaling
+    run_convert_csv_to_parquet(inputs, output_dir, os.cpu_count() or 1)
+
+def run_convert_excel(inputs, output_dir, engine='openpyxl'):
+    from functions import convert_excel
+    convert_excel(inputs[0], os.path.join(output_dir, 'out.csv'), [], engine)
+
+def run_convert_excel_pandas(inputs, output_dir):
+    # Same workbook loaded whole by pandas, against the streamed openpyxl read of excel_tall_to_csv
+    run_convert_excel(inputs, output_dir, 'pandas')
+
+def run_convert_json_to_csv(inputs, output_dir):
+    from functions import convert_json_to_csv
+    convert_json_to_csv(inputs[0], os.path.join(output_dir, 'out.csv'), [])
+
+def run_fragment_file(inputs, output_dir):
+    from functions import fragment_file
+    source = os.path.join(output_dir, os.path.basename(inputs[0]))
+    try:
+        os.link(inputs[0], source)
+    except OSError:
+        shutil.copyfile(inputs[0], source)
+    fragment_file(source, max(os.path.getsize(source) / (10 * 1024 * 1024), 0.01))
+
+def run_merge_sheets(inputs, output_dir):
+    from functions import merge_sheets
+    merge_sheets(inputs, os.path.join(output_dir, 'merged.csv'))
+
+# name -> (generator, function under test, runner)
+CASES = {
+    'csv_tall_to_excel': (generate_csv_tall, 'convert_csv_to_excel', run_convert_csv_to_excel),
+    'csv_wide_to_excel': (generate_csv_wide, 'convert_csv_to_excel', run_convert_csv_to_excel),
+    'csv_dirty_to_excel': (generate_csv_dirty, 'convert_csv_to_excel', run_convert_csv_to_excel),
+    'csv_tall_to_parquet': (generate_csv_tall, 'convert_to_columnar', run_convert_csv_to_parquet),
+    'csv_tall_to_parquet_parallel': (generate_csv_tall, 'convert_to_columnar', run_convert_csv_to_parquet_parallel),
+    'excel_tall_to_csv': (generate_excel_tall, 'convert_excel', run_convert_excel),
+    'excel_tall_to_csv_pandas': (generate_excel_tall, 'convert_excel', run_convert_excel_pandas),
+    'jsonl_nested_to_csv': (generate_jsonl_nested, 'convert_json_to_csv', run_convert_json_to_csv),
+    'fragment_csv_tall': (generate_csv_tall, 'fragment_file', run_fragment_file),
+    'merge_csv_files': (generate_merge_inputs, 'merge_sheets', run_merge_sheets),
+}
+
+def prepare_inputs(case, size_mb, seed, data_dir):
+    # Generated once per (generator, size, seed) and reused by later runs and cases
+    generator = CASES[case][0]
+    directory = os.path.join(data_dir, f"{generator.__name__[len('generate_'):]}_{size_mb}mb_seed{seed}")
+    meta_path = os.path.join(directory, 'meta.json')
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if all(os.path.exists(path) for path in meta['inputs']):
+            return meta
+    except (OSError, ValueError, KeyError):
+        pass
+
+    os.makedirs(directory, exist_ok=True)
+    logging.info(f"Generating {size_mb} MB of {generator.__name__[len('generate_'):]} data in {directory}")
+    rng = random.Random(f"{seed}:{generator.__name__}:{size_mb}")
+    inputs, rows = generator(directory, int(size_mb * 1024 * 1024), rng)
+    meta = {'inputs': inputs, 'rows': rows, 'bytes': sum(os.path.getsize(path) for path in inputs)}
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return meta
+
+def _children_peak_rss_mb():
+    # Largest peak among the finished child processes (CSV parse workers), not their sum
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if not peak:
+        return None
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _measure(case, inputs):
+    # Runs in a fresh process: imports are done before the clock starts, peak RSS is this case's own.
+    # Worker processes a case starts are reported apart, as the peak of the largest one.
+    import functions
+    runner = CASES[case][2]
+    output_dir = tempfile.mkdtemp(prefix='conversor_bench_')
+    logging.disable(logging.INFO)
+    try:
+        started = time.perf_counter()
+        runner(inputs, output_dir)
+        elapsed = time.perf_counter() - started
+        return elapsed, functions._peak_rss_mb(), _children_peak_rss_mb()
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+def run_case(case, size_mb, seed, data_dir, repeat):
+    meta = prepare_inputs(case, size_mb, seed, data_dir)
+    context = multiprocessing.get_context('spawn')
+    timings = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            timings.append(executor.submit(_measure, case, meta['inputs']).result())
+    seconds = min(elapsed for elapsed, _, _ in timings)
+    peaks = [peak for _, peak, _ in timings if peak is not None]
+    worker_peaks = [peak for _, _, peak in timings if peak is not None]
+    return {
+        'case': case,
+        'function': CASES[case][1],
+        'size_mb': size_mb,
+        'rows': meta['rows'],
+        'bytes': meta['bytes'],
+        'seconds': round(seconds, 4),
+        'rows_per_sec': round(meta['rows'] / seconds, 1) if seconds > 0 else None,
+        'mb_per_sec': round(meta['bytes'] / (1024 * 1024) / seconds, 2) if seconds > 0 else None,
+        'peak_rss_mb': round(max(peaks), 1) if peaks else None,
+        'worker_peak_rss_mb': round(max(worker_peaks), 1) if worker_peaks else None,
+        'repeat': repeat,
+    }
+
+def environment():
+    import pandas
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pandas': pandas.__version__,
+    }
+
+def compare(results, baseline, threshold):
+    # A case regresses when its time or peak memory grows by more than threshold (0.10 = 10%)
+    base = {(entry['case'], entry['size_mb']): entry for entry in baseline['results']}
+    regressions = []
+    for entry in results['results']:
+        previous = base.get((entry['case'], entry['size_mb']))
+        if previous is None:
+            print(f"{entry['case']:<22} {entry['size_mb']:>6} MB  no baseline")
+            continue
+        flags = []
+        for metric in ('seconds', 'peak_rss_mb', 'worker_peak_rss_mb'):
+            old, new = previous.get(metric), entry.get(metric)
+            if old and new is not None:
+                change = (new - old) / old
+                flags.append((metric, old, new, change))
+        regressed = [flag for flag in flags if flag[3] > threshold]
+        text = '  '.join(f"{metric} {old:g} -> {new:g} ({change:+.1%})" for metric, old, new, change in flags)
+        print(f"{entry['case']:<22} {entry['size_mb']:>6} MB  {text}{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(entry)
+    return regressions
+
+IMPORT_TIME_RUNS = 5
+
+def measure_import_time(runs=IMPORT_TIME_RUNS):
+    # Cumulative import time of the CLI module in ms, from -X importtime in fresh interpreters;
+    # the fastest run is kept so a busy machine does not fail the check
+    here = os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import conversor'], cwd=here, capture_output=True, text=True, check=True)
+        for line in completed.stderr.splitlines():
+            parts = [part.strip() for part in line.split('|')]
+            if len(parts) == 3 and parts[2] == 'conversor':
+                timings.append(int(parts[1]) / 1000)
+    return min(timings)
+
+def check_import_time():
+    from conversor import IMPORT_TIME_BUDGET_MS
+
+    elapsed = measure_import_time()
+    print(f"import conversor: {elapsed:.1f} ms (budget {IMPORT_TIME_BUDGET_MS} ms)")
+    if elapsed > IMPORT_TIME_BUDGET_MS:
+        print("Import time is over budget, check `python -X importtime -c \"import conversor\"` for heavy imports", file=sys.stderr)
+        return 1
+    return 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmark', description='Benchmark the conversion functions on generated data.')
+    parser.add_argument('--cases', help=f"Comma-separated cases to run (default: all of {', '.join(CASES)})")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES_MB), help='Comma-separated input sizes in MB, e.g. 10,100,2048')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='Seed of the data generator')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per case, the fastest one is reported')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'conversor_bench_data'), help='Where generated inputs are kept between runs')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', metavar='BASELINE', help='Compare against a stored results file and exit with 1 on regressions')
+    parser.add_argument('--results', help='With --compare, compare this results file instead of running the benchmarks')
+    parser.add_argument('--check-import-time', action='store_true', help='Only check that importing the CLI stays under IMPORT_TIME_BUDGET_MS, exit with 1 if not')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Relative slowdown or memory growth counted as a regression')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.check_import_time:
+        return check_import_time()
+
+    if args.results:
+        with open(args.results, 'r', encoding='utf-8') as f:
+            results = json.load(f)
+    else:
+        cases = args.cases.split(',') if args.cases else list(CASES)
+        unknown = [case for case in cases if case not in CASES]
+        if unknown:
+            print(f"Unknown case(s): {', '.join(unknown)}", file=sys.stderr)
+            return 2
+        sizes = [float(size) if '.' in size else int(size) for size in args.sizes.split(',')]
+
+        results = {'version': RESULTS_VERSION, 'seed': args.seed, 'environment': environment(), 'results': []}
+        for size_mb in sizes:
+            for case in cases:
+                entry = run_case(case, size_mb, args.seed, args.data_dir, args.repeat)
+                results['results'].append(entry)
+                logging.info(f"{case} {size_mb} MB: {entry['seconds']:.2f}s, {entry['rows_per_sec']} rows/sec, peak RSS {entry['peak_rss_mb']} MB")
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+        else:
+            print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
@@ -0,0 +1,226 @@
+import argparse
+import logging
+import os
+import signal
+import sys
+
+# Keep module-level imports to the standard library: pandas, openpyxl and friends are only
+# loaded once a conversion actually runs, so `--help` and cron wrappers start instantly.
+IMPORT_TIME_BUDGET_MS = 50
+
+FORMAT_NAMES = {
+    'excel': 'Excel',
+    'csv': 'CSV',
+    'json': 'JSON',
+    'parquet': 'Parquet',
+    'arrow': 'Arrow',
+}
+
+def conversion_type(value):
+    # 'csv-to-parquet' -> 'CSV to Parquet'
+    parts = value.lower().split('-to-')
+    if len(parts) != 2 or not all(part in FORMAT_NAMES for part in parts):
+        raise argparse.ArgumentTypeError(f"invalid conversion '{value}', expected e.g. csv-to-excel or excel-to-parquet")
+    return ' to '.join(FORMAT_NAMES[part] for part in parts)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='conversor', description='Convert every Excel, CSV, JSON, Parquet and Arrow file in a folder without the GUI.')
+    parser.add_argument('input_folder', help='Folder with the files to convert')
+    parser.add_argument('output_folder', help='Folder that receives the *_converted files')
+    parser.add_argument('--type', type=conversion_type, help='Only run this conversion, e.g. csv-to-excel (default: by file extension)')
+    parser.add_argument('--to', choices=sorted(FORMAT_NAMES), help='Output format for every input (default: by file extension)')
+    parser.add_argument('--compression', help='Output compression: snappy, zstd, lz4 or none for Parquet/Arrow; gzip, zstd, bz2 or xz for CSV')
+    parser.add_argument('--compression-level', type=int, help='Compression level of CSV outputs and their fragments (default: per codec)')
+    parser.add_argument('--columns', help='Comma-separated list of columns to keep (default: all)')
+    parser.add_argument('--filter', metavar='EXPR', help="Only convert rows matching this pandas expression, e.g. \"status == 'ACTIVE' and amount > 0\"")
+    parser.add_argument('--derive', metavar='NAME=EXPR', action='append', default=[], help="Add a column computed from others, e.g. 'total = price * quantity' (repeatable)")
+    parser.add_argument('--delimiter', help='CSV delimiter (default: sniffed from each file)')
+    parser.add_argument('--quotechar', help='CSV string delimiter (default: sniffed from each file)')
+    parser.add_argument('--header', action=argparse.BooleanOptionalAction, help='Whether CSV inputs start with a header row (default: sniffed from each file)')
+    parser.add_argument('--all-sheets', action='store_true', help='Export every sheet of Excel inputs to its own file')
+    parser.add_argument('--excel-engine', choices=['openpyxl', 'pandas'], default='openpyxl', help='Reader for Excel to CSV: openpyxl streams rows in constant memory, pandas loads each sheet at once')
+    parser.add_argument('--excel-format', choices=['XLS', 'XLSX'], help='Output format for CSV to Excel (default: XLSX)')
+    parser.add_argument('--fragment-size', type=float, help='Fragment outputs into parts of this many MB')
+    parser.add_argument('--fragment-rows', type=int, help='Fragment outputs into parts of this many rows')
+    parser.add_argument('--merge', metavar='FILE', help='Merge every CSV and Excel input into this file in the output folder instead of converting them')
+    parser.add_argument('--sort-by', help='With --merge, comma-separated columns to sort the merged rows by (default: file order, or the --dedupe-by columns when those are given)')
+    parser.add_argument('--dedupe-by', help='With --merge, comma-separated columns whose repeated values are dropped after the first row')
+    parser.add_argument('--merge-memory', type=int, default=512, help='With --merge, MB of rows sorted in memory before runs spill to temporary files')
+    parser.add_argument('--watch', action='store_true', help="Keep running and convert files as they land in the input folder. Conversion options given here are saved as the folder's profile and reused by later runs")
+    parser.add_argument('--settle', type=float, default=2.0, help='With --watch, seconds a file must stop growing before it is converted')
+    parser.add_argument('--poll', action='store_true', help='With --watch, rescan the folder instead of using inotify (network shares)')
+    parser.add_argument('--force', action='store_true', help='Convert every input even if the manifest in the output folder lists it as unchanged')
+    parser.add_argument('--metrics', metavar='FILE', help="Write per-job stage timings and throughput as JSON lines to FILE ('-' for stderr)")
+    parser.add_argument('--no-resume', action='store_true', help='Ignore checkpoints of interrupted conversions and start them over')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of parallel worker processes')
+    parser.add_argument('--parse-workers', type=int, help='Processes parsing each large CSV input or exporting the sheets of a workbook (default: the workers left over when there are fewer files than workers)')
+    return parser.parse_args(argv)
+
+def find_inputs(input_folder, requested_type=None, target=None):
+    from functions import conversion_types_for
+
+    inputs = []
+    for file_name in sorted(os.listdir(input_folder)):
+        file_path = os.path.normpath(os.path.join(input_folder, file_name))
+        available = conversion_types_for(file_name) if os.path.isfile(file_path) else []
+        if requested_type:
+            available = [file_type for file_type in available if file_type == requested_type]
+        if target:
+            available = [file_type for file_type in available if file_type.endswith(f" to {FORMAT_NAMES[target]}")]
+        if available:
+            inputs.append((file_path, available[0]))
+    return inputs
+
+def split_columns(value):
+    return [column.strip() for column in value.split(',') if column.strip()] if value else None
+
+def merge(args):
+    from functions import merge_sheets
+
+    files = [os.path.join(args.input_folder, file_name) for file_name in sorted(os.listdir(args.input_folder))]
+    files = [file_path for file_path in files if os.path.isfile(file_path)]
+    os.makedirs(args.output_folder, exist_ok=True)
+    try:
+        merge_sheets(files, os.path.join(args.output_folder, args.merge), sort_keys=split_columns(args.sort_by), dedupe_keys=split_columns(args.dedupe_by), memory_mb=args.merge_memory)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    return 0
+
+# Conversion options of the command line and the WatchProfile field each one sets
+PROFILE_OPTIONS = {
+    'to': 'target',
+    'columns': 'columns',
+    'delimiter': 'delimiter',
+    'quotechar': 'quotechar',
+    'header': 'has_header',
+    'excel_format': 'excel_format',
+    'compression': 'compression',
+    'compression_level': 'compression_level',
+    'fragment_size': 'fragment_size_mb',
+    'fragment_rows': 'fragment_rows',
+    'filter': 'row_filter',
+    'derive': 'derived_columns',
+}
+
+def watch(args):
+    from functions import parse_derived_columns
+    from watcher import WatchProfile, load_profile, save_profile, watch_folder
+
+    # --no-header is a False worth saving, only options left unset are skipped
+    options = {name: getattr(args, name) for name in PROFILE_OPTIONS if getattr(args, name) not in (None, [])}
+    try:
+        if 'to' in options:
+            options['to'] = FORMAT_NAMES[options['to']]
+        if 'columns' in options:
+            options['columns'] = split_columns(options['columns'])
+        if 'derive' in options:
+            options['derive'] = parse_derived_columns('\n'.join(options['derive'])) or None
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    # Options given on the command line replace those of the saved profile, the rest are kept
+    profile = load_profile(args.input_folder) or WatchProfile(args.output_folder)
+    profile.output_folder = args.output_folder
+    for name, value in options.items():
+        setattr(profile, PROFILE_OPTIONS[name], value)
+    save_profile(args.input_folder, profile)
+
+    import multiprocessing
+    stop = multiprocessing.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    try:
+        watch_folder(args.input_folder, profile, args.workers, stop, args.settle, args.poll)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    return 0
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.merge:
+        return merge(args)
+    if args.watch:
+        return watch(args)
+    columns = split_columns(args.columns)
+
+    inputs = find_inputs(args.input_folder, args.type, args.to)
+    if not inputs:
+        print(f"No files to convert in {args.input_folder}", file=sys.stderr)
+        return 1
+    os.makedirs(args.output_folder, exist_ok=True)
+
+    from functions import ConversionJob, METRICS_LOGGER, list_sheets, log_metrics, output_path_for, parse_derived_columns, run_jobs
+
+    try:
+        derived_columns = parse_derived_columns('\n'.join(args.derive)) or None
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    metrics_callback = None
+    if args.metrics:
+        handler = logging.StreamHandler(sys.stderr) if args.metrics == '-' else logging.FileHandler(args.metrics, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        METRICS_LOGGER.addHandler(handler)
+        METRICS_LOGGER.setLevel(logging.INFO)
+        METRICS_LOGGER.propagate = False
+        metrics_callback = log_metrics
+
+    def sheet_columns(file_path):
+        if not (args.all_sheets and file_path.lower().endswith('.xlsx')):
+            return None
+        return {sheet_name: columns for sheet_name in list_sheets(file_path)}
+
+    jobs = [
+        ConversionJob(
+            input_file=file_path,
+            output_file=output_path_for(file_path, args.output_folder, file_type, args.excel_format, args.compression),
+            conversion_type=file_type,
+            selected_columns=columns,
+            delimiter=args.delimiter,
+            string_delimiter=args.quotechar,
+            has_header=args.header,
+            compression=args.compression,
+            compression_level=args.compression_level,
+            sheet_columns=sheet_columns(file_path),
+            fragment_size_mb=args.fragment_size,
+            fragment_rows=args.fragment_rows,
+            resume=not args.no_resume,
+            row_filter=args.filter,
+            derived_columns=derived_columns,
+            parse_workers=args.parse_workers,
+            excel_engine=args.excel_engine,
+        )
+        for file_path, file_type in inputs
+    ]
+
+    def report(done, total):
+        logging.info(f"Progress: {done}/{total} files")
+
+    manifest = None
+    skipped = []
+    if not args.force:
+        from manifest import ConversionManifest
+        manifest = ConversionManifest.for_folder(args.output_folder)
+        jobs, skipped = manifest.partition(jobs)
+
+    # Ctrl+C stops the jobs at their next chunk so CSV outputs keep a checkpoint to resume from
+    import multiprocessing
+    cancel = multiprocessing.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: cancel.set())
+
+    failed = run_jobs(jobs, args.workers, report, manifest, metrics_callback, cancel)
+    if manifest is not None:
+        manifest.save()
+    logging.info(f"Converted {len(jobs) - len(failed)} of {len(jobs)} files into {args.output_folder}, skipped {len(skipped)} unchanged")
+    if cancel.is_set():
+        logging.warning("Cancelled, run again to resume")
+        return 130
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
@@ -1,85 +1,2055 @@
+import numpy as np
 import pandas as pd
+import bz2
+import gzip
+import heapq
+import itertools
 import json
+import lzma
 import os
 import logging
 import xlsxwriter
+import csv
+import io
+import mmap
+import numbers
+import pickle
+import re
+import tempfile
+import zipfile
+from xml.etree import ElementTree
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field, replace
+from row_index import _row_ends, load_row_index
+from storage import write_json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def convert_excel(input_file, output_file, selected_columns):
+COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz', '.zst': 'zstd'}
+CSV_COMPRESSIONS = ['none', 'gzip', 'zstd', 'bz2', 'xz']
+DEFAULT_COMPRESSION_LEVELS = {'gzip': 6, 'bz2': 9, 'xz': 6, 'zstd': 3}
+COMPRESSION_LEVEL_RANGES = {'gzip': (1, 9), 'bz2': (1, 9), 'xz': (0, 9), 'zstd': (1, 22)}
+
+def split_compression(file_path):
+    # 'feed.csv.gz' -> ('feed.csv', 'gzip'); other paths come back unchanged with None
+    root, suffix = os.path.splitext(file_path)
+    codec = COMPRESSION_SUFFIXES.get(suffix.lower())
+    return (root, codec) if codec else (file_path, None)
+
+def compression_suffix(codec):
+    return next((suffix for suffix, name in COMPRESSION_SUFFIXES.items() if name == codec), '')
+
+def _require_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Zstandard files need the optional 'zstandard' package (pip install zstandard).")
+    return zstandard
+
+class _DecompressedReader(io.BufferedReader):
+    # Buffered decompressed stream that also closes the compressed file underneath and keeps
+    # it reachable as .source, whose position tells how far into the input a reader got
+    def __init__(self, decompressor, source):
+        super().__init__(decompressor)
+        self.source = source
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.source.close()
+
+def open_input(file_path):
+    # Binary stream of the file's content, decompressed on the fly for .gz/.bz2/.xz/.zst
+    codec = split_compression(file_path)[1]
+    if codec is None:
+        return open(file_path, 'rb')
+    source = open(file_path, 'rb')
     try:
-        df = pd.read_excel(input_file, usecols=selected_columns)
-        df.to_csv(output_file, index=False, encoding='utf-8')
+        if codec == 'gzip':
+            decompressor = gzip.GzipFile(fileobj=source, mode='rb')
+        elif codec == 'bz2':
+            decompressor = bz2.BZ2File(source, 'rb')
+        elif codec == 'xz':
+            decompressor = lzma.LZMAFile(source, 'rb')
+        else:
+            decompressor = _require_zstandard().ZstdDecompressor().stream_reader(source, read_across_frames=True)
+    except BaseException:
+        source.close()
+        raise
+    return _DecompressedReader(decompressor, source)
+
+def _open_binary_output(file_path, level=None):
+    codec = split_compression(file_path)[1]
+    if codec is None:
+        return open(file_path, 'wb')
+    level = DEFAULT_COMPRESSION_LEVELS[codec] if level is None else level
+    if codec == 'gzip':
+        return gzip.open(file_path, 'wb', compresslevel=level)
+    if codec == 'bz2':
+        return bz2.open(file_path, 'wb', compresslevel=level)
+    if codec == 'xz':
+        return lzma.open(file_path, 'wb', preset=level)
+    return _require_zstandard().ZstdCompressor(level=level).stream_writer(open(file_path, 'wb'), closefd=True)
+
+def open_output(file_path, level=None):
+    # Text stream for a CSV output, compressed when the path ends in a compression suffix
+    if split_compression(file_path)[1] is None:
+        return open(file_path, 'w', newline='', encoding='utf-8')
+    return io.TextIOWrapper(_open_binary_output(file_path, level), encoding='utf-8', newline='')
+
+SAMPLE_ROWS = 10
+
+def _sample_value(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return ''
+    return str(value)
+
+SNIFF_BYTES = 64 * 1024
+SNIFF_DELIMITERS = ',;\t|'
+HEADER_SNIFF_ROWS = 20
+
+_BOMS = [
+    (b'\xef\xbb\xbf', 'utf-8-sig'),
+    (b'\xff\xfe', 'utf-16'),
+    (b'\xfe\xff', 'utf-16'),
+]
+
+def _decode_sample(sample):
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return sample.decode(encoding, errors='ignore'), encoding
+    # A multi-byte character may be cut at the end of the sample
+    for trim in range(4):
+        try:
+            return sample[:len(sample) - trim].decode('utf-8'), 'utf-8'
+        except UnicodeDecodeError:
+            continue
+    try:
+        return sample.decode('cp1252'), 'cp1252'
+    except UnicodeDecodeError:
+        return sample.decode('latin-1'), 'latin-1'
+
+def sniff_csv_dialect(file_path, sample_bytes=SNIFF_BYTES):
+    with open_input(file_path) as f:
+        sample = f.read(sample_bytes)
+    text, encoding = _decode_sample(sample)
+    if len(sample) == sample_bytes and '\n' in text:
+        text = text[:text.rindex('\n') + 1]
+
+    sniffer = csv.Sniffer()
+    try:
+        dialect = sniffer.sniff(text, delimiters=SNIFF_DELIMITERS)
+        delimiter, quotechar = dialect.delimiter, dialect.quotechar or '"'
+    except csv.Error:
+        first_line = text.split('\n', 1)[0]
+        delimiter = max(SNIFF_DELIMITERS, key=first_line.count)
+        quotechar = '"'
+    rows = list(itertools.islice(csv.reader(io.StringIO(text), delimiter=delimiter, quotechar=quotechar), HEADER_SNIFF_ROWS))
+    return {'delimiter': delimiter, 'quotechar': quotechar, 'encoding': encoding, 'has_header': _looks_like_header(rows)}
+
+def _looks_like_number(value):
+    try:
+        float(value.replace(',', '.'))
+        return True
+    except ValueError:
+        return False
+
+def _looks_like_header(rows):
+    # A header is assumed unless the first row reads like the rows below it: only numbers
+    # (or blanks) where those rows hold numbers. Csv.Sniffer.has_header also calls all-text
+    # tables and year headers such as region,2023,2024 headerless, so it is not used here
+    if not rows:
+        return True
+    first, rest = [value.strip() for value in rows[0]], rows[1:]
+    if not any(first):
+        return True
+    for column, value in enumerate(first):
+        if not value:
+            continue
+        if not _looks_like_number(value):
+            return True
+        below = [row[column].strip() for row in rest if column < len(row) and row[column].strip()]
+        if not all(_looks_like_number(other) for other in below):
+            return True
+    return False
+
+def _csv_read_options(input_file, delimiter, quotechar, encoding=None, has_header=True):
+    options = {'delimiter': delimiter, 'quotechar': quotechar or '"', 'encoding': encoding}
+    if not has_header:
+        # Headerless files get stable names so selections can refer to their columns
+        width = pd.read_csv(input_file, header=None, nrows=1, **options).shape[1]
+        options['header'] = None
+        options['names'] = [f"Column {index + 1}" for index in range(width)]
+    return options
+
+def read_file_sample(file_path, delimiter=None, quotechar='"', nrows=SAMPLE_ROWS, encoding=None, has_header=True, sheet_name=None):
+    # Compressed CSV and JSON are sampled through the decompressor, pandas does the same by suffix
+    lower = split_compression(file_path)[0].lower()
+    dialect = None
+    if lower.endswith('.csv'):
+        if delimiter is None:
+            dialect = sniff_csv_dialect(file_path)
+            delimiter, quotechar = dialect['delimiter'], dialect['quotechar']
+            encoding, has_header = dialect['encoding'], dialect['has_header']
+        df = pd.read_csv(file_path, nrows=nrows, **_csv_read_options(file_path, delimiter, quotechar, encoding, has_header))
+        columns = df.columns.tolist()
+        rows = [list(values) for values in df.itertuples(index=False, name=None)]
+    elif lower.endswith('.xlsx'):
+        excel_rows = _iter_excel_rows(file_path, None, sheet_name)
+        try:
+            columns = next(excel_rows, [])
+            rows = [values for _, values in zip(range(nrows), excel_rows)]
+        finally:
+            excel_rows.close()
+        sheets = list_sheets(file_path) if sheet_name is None else None
+    elif lower.endswith(JSON_EXTENSIONS):
+        columns = discover_json_columns(file_path, max_lines=nrows)
+        rows = list(_iter_json_rows(file_path, columns, max_lines=nrows))
+    elif lower.endswith(COLUMNAR_EXTENSIONS):
+        columns, rows = [], []
+        for batch in _iter_columnar_batches(file_path, None, nrows):
+            columns = batch.schema.names
+            rows = [list(values) for values in batch.to_pandas().head(nrows).itertuples(index=False, name=None)]
+            break
+    else:
+        return {'columns': [], 'rows': []}
+    sample = {'columns': columns, 'rows': [[_sample_value(value) for value in row] for row in rows]}
+    if dialect is not None:
+        sample['dialect'] = dialect
+    if lower.endswith('.xlsx') and sheet_name is None:
+        sample['sheets'] = sheets
+    return sample
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _log_throughput(input_file, engine, rows, started, start_peak=None):
+    # ru_maxrss is the peak over the whole process, which may come from an earlier job in the same
+    # process: the growth during this job is logged next to it. Compare engines with benchmark.py,
+    # which runs each one in a fresh process.
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed > 0 else float(rows)
+    peak = _peak_rss_mb()
+    peak_text = f"{peak:.1f} MB, +{peak - (start_peak or 0):.1f} MB during this job" if peak is not None else "n/a"
+    logging.info(f"{input_file} [{engine}]: {rows} rows in {elapsed:.2f}s ({rate:.0f} rows/sec, process peak RSS {peak_text})")
+
+PROGRESS_INTERVAL = 0.5  # Seconds between progress events of one job
+PROGRESS_ROWS = 10000  # Rows between progress checks in row-at-a-time loops
+METRICS_LOGGER = logging.getLogger('conversor.metrics')
+
+class ConversionMetrics:
+    # Stage durations, row and byte counts of one job. Conversion functions take metrics=None
+    # and only measure when given an instance, so instrumentation costs nothing when it is off.
+    # Stage times are exclusive: time spent in a nested stage is not counted in the outer one.
+    # Nesting is tracked per thread, so stages timed on other threads are not subtracted.
+    def __init__(self, input_file, report=None, interval=PROGRESS_INTERVAL):
+        self.input_file = input_file
+        self.report = report
+        self.interval = interval
+        self.stages = {}
+        self.rows = 0
+        self.total_rows = None
+        self.source = None
+        self.bytes_in = 0
+        try:
+            self.total_bytes = os.path.getsize(input_file)
+        except OSError:
+            self.total_bytes = None
+        self.lock = threading.Lock()
+        self.started = self._reported = time.perf_counter()
+        self._local = threading.local()  # Seconds staged so far on each thread
+
+    def _add(self, name, seconds):
+        with self.lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+        self._local.staged = getattr(self._local, 'staged', 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        started, staged = time.perf_counter(), getattr(self._local, 'staged', 0.0)
+        try:
+            yield
+        finally:
+            self._add(name, time.perf_counter() - started - (getattr(self._local, 'staged', 0.0) - staged))
+
+    def timed(self, iterable, name):
+        # Charges the time spent producing each item to the stage, e.g. parsing to 'read'
+        iterator = iter(iterable)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self._add(name, time.perf_counter() - started)
+                yield item
+        finally:
+            if hasattr(iterator, 'close'):
+                iterator.close()
+
+    def add_total_rows(self, rows):
+        with self.lock:
+            self.total_rows = (self.total_rows or 0) + rows
+
+    def counts(self):
+        # Stages and rows of a part of a job measured in a worker process, see merge
+        return {'stages': dict(self.stages), 'rows': self.rows, 'total_rows': self.total_rows}
+
+    def merge(self, counts):
+        with self.lock:
+            for name, seconds in counts['stages'].items():
+                self.stages[name] = self.stages.get(name, 0.0) + seconds
+            if counts['total_rows'] is not None:
+                self.total_rows = (self.total_rows or 0) + counts['total_rows']
+        self.add_rows(counts['rows'])
+
+    def watch(self, source):
+        # The input file a reader streams from; its position is read only when progress is reported
+        self.source = source
+
+    def _update_bytes_in(self):
+        if self.source is not None:
+            try:
+                self.bytes_in = self.source.tell()
+            except (OSError, ValueError):
+                pass
+
+    def add_rows(self, rows):
+        with self.lock:
+            self.rows += rows
+        now = time.perf_counter()
+        if self.report is not None and now - self._reported >= self.interval:
+            self._reported = now
+            self.report(self.progress_event())
+
+    def fraction(self):
+        # Share of the input done so far, from bytes where the reader tracks them, else from rows
+        self._update_bytes_in()
+        if self.bytes_in and self.total_bytes:
+            return min(self.bytes_in / self.total_bytes, 1.0)
+        if self.total_rows:
+            return min(self.rows / self.total_rows, 1.0)
+        return None
+
+    def progress_event(self):
+        elapsed = time.perf_counter() - self.started
+        fraction = self.fraction()
+        return {
+            'event': 'progress',
+            'input_file': self.input_file,
+            'rows': self.rows,
+            'total_rows': self.total_rows,
+            'bytes_in': self.bytes_in,
+            'total_bytes': self.total_bytes,
+            'fraction': fraction,
+            'elapsed': round(elapsed, 3),
+            'rows_per_sec': round(self.rows / elapsed, 1) if elapsed > 0 else None,
+            'eta': round(elapsed * (1 - fraction) / fraction, 1) if fraction else None,
+        }
+
+    def summary(self, outputs):
+        elapsed = time.perf_counter() - self.started
+        bytes_out = sum(os.path.getsize(output) for output in outputs if os.path.exists(output))
+        return {
+            'event': 'job',
+            'input_file': self.input_file,
+            'outputs': list(outputs),
+            'seconds': round(elapsed, 3),
+            'stages': {name: round(seconds, 3) for name, seconds in self.stages.items()},
+            'rows': self.rows,
+            'bytes_in': self.total_bytes,
+            'bytes_out': bytes_out,
+            'rows_per_sec': round(self.rows / elapsed, 1) if elapsed > 0 else None,
+            'mb_per_sec': round((self.total_bytes or 0) / (1024 * 1024) / elapsed, 2) if elapsed > 0 else None,
+            'peak_rss_mb': round(_peak_rss_mb(), 1) if _peak_rss_mb() is not None else None,
+        }
+
+def _stage(metrics, name):
+    return metrics.stage(name) if metrics is not None else nullcontext()
+
+def _timed(metrics, iterable, name):
+    return metrics.timed(iterable, name) if metrics is not None else iterable
+
+def log_metrics(event):
+    # One JSON object per line; job summaries at INFO, progress ticks at DEBUG
+    level = logging.INFO if event.get('event') == 'job' else logging.DEBUG
+    if METRICS_LOGGER.isEnabledFor(level):
+        METRICS_LOGGER.log(level, json.dumps(event))
+
+class ConversionCancelled(Exception):
+    pass
+
+def _check_cancelled(cancel):
+    # cancel is a threading or multiprocessing Event, checked between chunks
+    if cancel is not None and cancel.is_set():
+        raise ConversionCancelled("Conversion cancelled")
+
+def _checked_rows(rows, cancel):
+    # Passes rows through, checking cancel every PROGRESS_ROWS of them, for loops that buffer a
+    # whole batch or run before they get to check themselves
+    if cancel is None:
+        yield from rows
+        return
+    for count, row in enumerate(rows, 1):
+        if count % PROGRESS_ROWS == 0:
+            _check_cancelled(cancel)
+        yield row
+
+CHECKPOINT_SECONDS = 30
+
+class _Checkpoint:
+    # Resume point of a conversion that appends to a CSV output: a reader-specific position in
+    # the input (byte offset, rows or batches) and the output length at that moment. Kept in
+    # <output>.checkpoint.json, valid only for the same input file and settings.
+    def __init__(self, input_file, output_file, settings, interval=CHECKPOINT_SECONDS):
+        self.path = f"{output_file}.checkpoint.json"
+        self.output_file = output_file
+        stat = os.stat(input_file)
+        self.identity = {
+            'input_file': os.path.abspath(input_file),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'settings': settings,
+        }
+        self.interval = interval
+        self.position = 0
+        self.read_position = 0  # Set by readers that run ahead of what has been written
+        self.output_bytes = 0
+        self.saved = time.perf_counter()
+
+    def load(self):
+        # True when a matching checkpoint exists; the output is then cut back to its saved length
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            if stored['identity'] != json.loads(json.dumps(self.identity)) or os.path.getsize(self.output_file) < stored['output_bytes']:
+                return False
+        except (OSError, ValueError, KeyError):
+            return False
+        self.position = stored['position']
+        self.output_bytes = stored['output_bytes']
+        os.truncate(self.output_file, self.output_bytes)
+        logging.info(f"Resuming {self.output_file} from checkpoint at {self.position}")
+        return True
+
+    def commit(self, position, output):
+        # Marks everything written so far as complete; persisted at most once per interval
+        output.flush()
+        self.position = position
+        self.output_bytes = os.fstat(output.fileno()).st_size
+        if time.perf_counter() - self.saved >= self.interval:
+            self.save(output)
+
+    def save(self, output):
+        # Writes the last committed state; anything written after it is cut off on resume
+        os.fsync(output.fileno())
+        write_json(self.path, {'identity': self.identity, 'position': self.position, 'output_bytes': self.output_bytes})
+        self.saved = time.perf_counter()
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+def _open_checkpointed(input_file, output_file, settings, resume, compression_level=None):
+    # Returns (checkpoint or None, resumed, output file object). A compressed output cannot be
+    # cut back to a checkpoint, so it is always written from the start.
+    if split_compression(output_file)[1] is not None:
+        return None, False, open_output(output_file, compression_level)
+    checkpoint = _Checkpoint(input_file, output_file, settings) if resume else None
+    resumed = checkpoint is not None and checkpoint.load()
+    return checkpoint, resumed, open(output_file, 'a' if resumed else 'w', newline='', encoding='utf-8')
+
+def list_sheets(input_file):
+    # Sheet names straight from xl/workbook.xml, without loading styles or shared strings
+    with zipfile.ZipFile(input_file) as archive:
+        workbook_path = 'xl/workbook.xml'
+        try:
+            relations = ElementTree.fromstring(archive.read('_rels/.rels'))
+            for relation in relations:
+                if relation.get('Type', '').endswith('/officeDocument'):
+                    workbook_path = relation.get('Target').lstrip('/')
+                    break
+        except KeyError:
+            pass
+        workbook = ElementTree.fromstring(archive.read(workbook_path))
+    return [element.get('name') for element in workbook.iter() if element.tag.rsplit('}', 1)[-1] == 'sheet']
+
+def _open_workbook(input_file):
+    import openpyxl
+    return openpyxl.load_workbook(input_file, read_only=True, data_only=True)
+
+def _iter_excel_rows(input_file, selected_columns, sheet_name=None, workbook=None, metrics=None, skip_rows=0):
+    owns_workbook = workbook is None
+    if owns_workbook:
+        workbook = _open_workbook(input_file)
+    try:
+        worksheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        if metrics is not None and worksheet.max_row:
+            # From the sheet's stored dimension, so it is an estimate for files that omit it
+            metrics.add_total_rows(worksheet.max_row - 1)
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        # Name header cells the way pandas does so selections made on either side match
+        header = _dedupe_names(['' if value is None else str(value) for value in header])
+        if selected_columns:
+            positions = {value: index for index, value in enumerate(header)}
+            missing = [column for column in selected_columns if column not in positions]
+            if missing:
+                raise ValueError(f"Columns not found in {input_file}: {missing}")
+            # Keep the sheet's column order, like pd.read_excel(usecols=...)
+            indices = sorted(positions[column] for column in selected_columns)
+        else:
+            indices = list(range(len(header)))
+        yield [header[index] for index in indices]
+        if skip_rows:
+            # Resuming: the first skip_rows data rows were already written
+            rows = worksheet.iter_rows(min_row=skip_rows + 2, values_only=True)
+
+        # Trailing blank rows are dropped the way pandas does, blank rows in between are kept
+        pending_blank = 0
+        for row in rows:
+            values = [row[index] if index < len(row) else None for index in indices]
+            if all(value is None for value in values):
+                pending_blank += 1
+                continue
+            for _ in range(pending_blank):
+                yield [None] * len(indices)
+            pending_blank = 0
+            yield values
+    finally:
+        if owns_workbook:
+            workbook.close()
+
+def _write_rows_csv(rows, output, metrics=None, cancel=None, checkpoint=None, resumed=False):
+    # rows yields the header first; a resumed output already has it, and checkpoint.position
+    # counts the data rows written before
+    writer = csv.writer(output)
+    done = checkpoint.position if resumed else 0
+    written = 0
+    with _stage(metrics, 'write'):
+        rows = _timed(metrics, rows, 'read')
+        header = next(rows, None)
+        if header is None:
+            return 0
+        if not resumed:
+            writer.writerow(header)
+            if checkpoint is not None:
+                checkpoint.commit(0, output)
+        try:
+            for values in rows:
+                writer.writerow(values)
+                written += 1
+                if written % PROGRESS_ROWS == 0:
+                    if metrics is not None:
+                        metrics.add_rows(PROGRESS_ROWS)
+                    if checkpoint is not None:
+                        checkpoint.commit(done + written, output)
+                    _check_cancelled(cancel)
+        except BaseException:
+            if checkpoint is not None:
+                checkpoint.save(output)
+            raise
+    if metrics is not None:
+        metrics.add_rows(written % PROGRESS_ROWS)
+    return done + written
+
+def convert_excel(input_file, output_file, selected_columns, engine='openpyxl', metrics=None, cancel=None, resume=False, compression_level=None, transform=None):
+    try:
+        started = time.perf_counter()
+        start_peak = _peak_rss_mb()
+        if engine == 'pandas':
+            with _stage(metrics, 'read'):
+                df = pd.read_excel(input_file, usecols=None if transform else selected_columns or None)
+            if transform is not None:
+                with _stage(metrics, 'transform'):
+                    df = transform.apply(df, selected_columns)
+            with _stage(metrics, 'write'):
+                df.to_csv(output_file, index=False, encoding='utf-8')
+            rows = len(df.index)
+            if metrics is not None:
+                metrics.add_rows(rows)
+        else:
+            # Walk the sheet in read-only mode and write CSV rows as they come. Checkpoints count
+            # rows written, which stop matching rows read once a filter drops some.
+            checkpoint, resumed, f = _open_checkpointed(input_file, output_file, {'columns': selected_columns}, resume and transform is None, compression_level)
+            with f:
+                if transform is None:
+                    excel_rows = _iter_excel_rows(input_file, selected_columns, metrics=metrics, skip_rows=checkpoint.position if resumed else 0)
+                else:
+                    excel_rows = _transform_rows(_iter_excel_rows(input_file, None, metrics=metrics), transform, selected_columns, cancel=cancel)
+                rows = _write_rows_csv(excel_rows, f, metrics, cancel, checkpoint, resumed)
+            if checkpoint is not None:
+                checkpoint.remove()
+        _log_throughput(input_file, engine, rows, started, start_peak)
         logging.info(f"File converted successfully from {input_file} to {output_file}")
     except Exception as e:
         logging.error(f"Error converting file from {input_file} to {output_file}: {e}")
         raise e
 
-def convert_csv_to_excel(input_file, output_file, selected_columns, delimiter, string_delimiter):
+def sheet_output_path(output_file, sheet_name):
+    base, codec = split_compression(output_file)
+    root, extension = os.path.splitext(base)
+    safe_name = re.sub(r'[\\/:*?"<>|]+', '_', sheet_name).strip() or 'Sheet'
+    return f"{root}_{safe_name}{extension}{compression_suffix(codec)}"
+
+def _convert_sheet(input_file, sheet_name, output_path, columns, output_format='CSV', compression=None, compression_level=None, transform=None, workbook=None, metrics=None, cancel=None):
+    if transform is None:
+        rows = _iter_excel_rows(input_file, columns, sheet_name, workbook, metrics)
+    else:
+        rows = _transform_rows(_iter_excel_rows(input_file, None, sheet_name, workbook, metrics), transform, columns, cancel=cancel)
+    if output_format == 'CSV':
+        with open_output(output_path, compression_level) as f:
+            return _write_rows_csv(rows, f, metrics, cancel)
+    writer = _ColumnarWriter(output_path, output_format, compression)
+    try:
+        header = next(rows, [])
+        for df in _timed(metrics, _batched_frames(rows, header, COLUMNAR_BATCH_ROWS, cancel), 'read'):
+            with _stage(metrics, 'write'):
+                writer.write(df)
+            if metrics is not None:
+                metrics.add_rows(len(df))
+            _check_cancelled(cancel)
+    finally:
+        writer.close()
+        rows.close()
+
+# Cancel event of a sheet worker process, set by the pool initializer
+_sheet_cancel = None
+
+def _init_sheet_worker(cancel):
+    global _sheet_cancel
+    _sheet_cancel = cancel
+
+def _convert_sheet_worker(input_file, sheet_name, output_path, columns, output_format, compression, compression_level, transform, measure):
+    # Opens its own read-only workbook; returns the sheet's counts for the job's metrics
+    metrics = ConversionMetrics(input_file) if measure else None
+    _convert_sheet(input_file, sheet_name, output_path, columns, output_format, compression, compression_level, transform, metrics=metrics, cancel=_sheet_cancel)
+    return metrics.counts() if metrics is not None else None
+
+def convert_excel_sheets(input_file, output_file, sheet_columns, output_format='CSV', compression=None, max_workers=None, metrics=None, cancel=None, compression_level=None, transform=None):
+    # Parsing cells holds the GIL, so sheets run in parallel processes, each opening the workbook
+    # itself. With one worker the sheets share one read-only workbook (one open archive, one
+    # shared-strings table) and run one after another. Metrics of sheets converted in processes
+    # arrive as each sheet finishes.
+    try:
+        outputs = {sheet_name: sheet_output_path(output_file, sheet_name) for sheet_name in sheet_columns}
+        workers = min(max_workers or os.cpu_count() or 1, len(outputs))
+        if workers <= 1:
+            workbook = _open_workbook(input_file)
+            try:
+                for sheet_name, output_path in outputs.items():
+                    _convert_sheet(input_file, sheet_name, output_path, sheet_columns[sheet_name], output_format, compression, compression_level, transform, workbook, metrics, cancel)
+                    logging.info(f"Sheet '{sheet_name}' of {input_file} converted to {output_path}")
+            finally:
+                workbook.close()
+            return list(outputs.values())
+
+        # A threading.Event cannot reach other processes, the sheets already running then finish
+        shared_cancel = None if cancel is None or isinstance(cancel, threading.Event) else cancel
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_sheet_worker, initargs=(shared_cancel,)) as executor:
+            futures = {
+                executor.submit(_convert_sheet_worker, input_file, sheet_name, output_path, sheet_columns[sheet_name], output_format, compression, compression_level, transform, metrics is not None): sheet_name
+                for sheet_name, output_path in outputs.items()
+            }
+            for future in as_completed(futures):
+                if cancel is not None and cancel.is_set():
+                    for pending in futures:
+                        pending.cancel()
+                    _check_cancelled(cancel)
+                counts = future.result()
+                if counts is not None:
+                    metrics.merge(counts)
+                logging.info(f"Sheet '{futures[future]}' of {input_file} converted to {outputs[futures[future]]}")
+        return list(outputs.values())
+    except Exception as e:
+        logging.error(f"Error converting sheets of {input_file}: {e}")
+        raise e
+
+CSV_CHUNK_SIZE = 100000
+EXCEL_MAX_ROWS = 1048576
+
+def _frame_rows(df):
+    # xlsxwriter rejects NaN, so blanks are written as empty cells like to_excel does
+    df = df.astype(object).where(df.notna(), None)
+    return df.itertuples(index=False, name=None)
+
+def parse_derived_columns(text):
+    # 'total = price * quantity' per line (or ';'-separated) -> {'total': 'price * quantity'}
+    derived = {}
+    for line in re.split(r'[\n;]', text or ''):
+        if not line.strip():
+            continue
+        name, separator, expression = line.partition('=')
+        if not separator or not name.strip() or not expression.strip() or expression.startswith('=') or name.rstrip()[-1] in '<>!':
+            raise ValueError(f"Derived column '{line.strip()}' is not of the form name = expression")
+        derived[name.strip()] = expression.strip()
+    return derived
+
+class RowTransform:
+    # Row filter and derived columns of a job as pandas expressions, evaluated on each chunk as it
+    # is read so dropped rows are never written, e.g. row_filter="status == 'ACTIVE' and amount > 0"
+    # and derived={'total': 'price * quantity'}. Column names with spaces are quoted in backticks.
+    # Expressions see every column of the input, the selection only decides what is written.
+    def __init__(self, row_filter=None, derived=None):
+        self.row_filter = (row_filter or '').strip() or None
+        self.derived = dict(derived or {})
+
+    @classmethod
+    def for_job(cls, job):
+        if not job.row_filter and not job.derived_columns:
+            return None
+        return cls(job.row_filter, job.derived_columns)
+
+    def settings(self):
+        return {'row_filter': self.row_filter, 'derived': self.derived}
+
+    def output_columns(self, columns, selected_columns=None):
+        if selected_columns:
+            missing = [column for column in selected_columns if column not in columns]
+            if missing:
+                raise ValueError(f"Columns not found: {missing}")
+        output = [column for column in columns if not selected_columns or column in selected_columns]
+        return output + [name for name in self.derived if name not in output]
+
+    def apply(self, df, selected_columns=None):
+        columns = self.output_columns(list(df.columns), selected_columns)
+        # Rows built from Excel or JSON values arrive as objects, give the expressions real dtypes
+        # but write the original values so integers next to blanks do not turn into floats
+        objects = bool((df.dtypes == object).any())
+        typed = df.infer_objects() if objects else df
+        if self.row_filter:
+            mask = typed.eval(self.row_filter)
+            if not isinstance(mask, pd.Series) or not pd.api.types.is_bool_dtype(mask):
+                raise ValueError(f"Row filter '{self.row_filter}' is not a condition")
+            # Comparisons with a missing value drop the row
+            mask = mask.fillna(False).astype(bool)
+            df = df[mask]
+            typed = typed[mask] if objects else df
+        if self.derived:
+            df = df.copy()
+            typed = typed.copy() if objects else df
+            for name, expression in self.derived.items():
+                # Later expressions may use the columns derived before them
+                typed[name] = df[name] = typed.eval(expression)
+        return df[columns]
+
+def _transform_rows(rows, transform, selected_columns=None, batch_rows=None, cancel=None):
+    # Header-first rows through a RowTransform, batch by batch, back out as header-first rows
+    header = next(rows, None)
+    if header is None:
+        return
+    yield transform.output_columns(header, selected_columns)
+    for df in _batched_frames(rows, header, batch_rows or COLUMNAR_BATCH_ROWS, cancel):
+        yield from _frame_rows(transform.apply(df, selected_columns))
+
+def _typed_frame(columns, rows):
+    # Preview rows are strings; numbers are parsed back so filters compare them as numbers
+    df = pd.DataFrame(rows, columns=columns, dtype=object).replace('', None)
+    for column in df.columns:
+        try:
+            df[column] = pd.to_numeric(df[column])
+        except (ValueError, TypeError):
+            pass
+    return df
+
+def preview_transform(columns, rows, transform, selected_columns=None):
+    # The preview sample or page as it would come out of the conversion: (columns, rows)
+    df = transform.apply(_typed_frame(columns, rows), selected_columns)
+    return list(df.columns), [[_sample_value(value) for value in row] for row in df.itertuples(index=False, name=None)]
+
+class _ExcelRowWriter:
+    # Constant-memory workbook that starts a new sheet (Sheet, Sheet_2, ...) whenever one is full
+    def __init__(self, output_file, header, sheet_name='Sheet1'):
+        self.workbook = xlsxwriter.Workbook(output_file, {
+            'constant_memory': True,
+            'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+            'remove_timezone': True,
+        })
+        self.workbook.use_zip64()
+        self.header = [str(column) for column in header]
+        self.sheet_name = sheet_name
+        self.sheets = 0
+        self._add_sheet()
+
+    def _add_sheet(self):
+        self.sheets += 1
+        name = self.sheet_name if self.sheets == 1 else f"{self.sheet_name}_{self.sheets}"
+        self.worksheet = self.workbook.add_worksheet(name)
+        self.worksheet.write_row(0, 0, self.header)
+        self.row = 1
+
+    def write_row(self, values):
+        if self.row >= EXCEL_MAX_ROWS:
+            self._add_sheet()
+        self.worksheet.write_row(self.row, 0, values)
+        self.row += 1
+
+    def close(self):
+        self.workbook.close()
+
+class _CsvRowWriter:
+    def __init__(self, output_file, header):
+        self.file = open_output(output_file)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(header)
+        self.sheets = 1
+
+    def write_row(self, values):
+        self.writer.writerow(values)
+
+    def close(self):
+        self.file.close()
+
+CSV_BLOCK_BYTES = 32 * 1024 * 1024
+
+def _dedupe_names(names):
+    # Same naming pandas uses for blank and repeated header cells
+    seen = {}
+    result = []
+    for index, name in enumerate(names):
+        name = name if name != '' else f"Unnamed: {index}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        seen.setdefault(name, 0)
+        result.append(name)
+    return result
+
+def _last_row_end(buffer, quote):
+    # Last newline that is not inside a quoted field; escaped quotes ("") keep the count even
+    quotes_after = 0
+    end = len(buffer)
+    total = buffer.count(quote)
+    while True:
+        newline = buffer.rfind(b'\n', 0, end)
+        if newline == -1:
+            return -1
+        quotes_after += buffer.count(quote, newline, end)
+        if (total - quotes_after) % 2 == 0:
+            return newline + 1
+        end = newline
+
+def _iter_csv_blocks(f, quote, block_size):
+    carry = b''
+    while True:
+        data = f.read(block_size)
+        if not data:
+            if carry:
+                yield carry
+            return
+        buffer = carry + data
+        cut = _last_row_end(buffer, quote)
+        if cut <= 0:
+            carry = buffer
+            continue
+        carry = buffer[cut:]
+        yield buffer[:cut]
+
+def _read_csv_header(f, delimiter, quotechar, encoding):
+    quote = quotechar.encode('ascii')
+    line = f.readline()
+    while line.count(quote) % 2:
+        more = f.readline()
+        if not more:
+            break
+        line += more
+    text = line.decode('utf-8-sig' if encoding in (None, 'utf-8') else encoding)
+    header = next(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter, quotechar=quotechar), [])
+    return _dedupe_names(header), line.count(b'\n')
+
+def _parse_block_fast(block, names, options, engine):
+    # usecols would let the parser drop surplus fields silently, so every column is parsed and
+    # a surplus field in the first row (which pandas turns into an index) counts as a failure
+    df = pd.read_csv(io.BytesIO(block), header=None, names=names, engine=engine, **options)
+    if not isinstance(df.index, pd.RangeIndex):
+        raise pd.errors.ParserError("Row has more fields than the header")
+    return df
+
+def _parse_block_columns(block, names, options, engine, columns):
+    # Worker side of a parallel parse: only the selected columns travel back to the reader
+    return _parse_block_fast(block, names, options, engine)[columns]
+
+PARSE_BLOCKS_PER_WORKER = 2  # Blocks queued per parse worker, enough to keep every core busy
+
+def _parse_csv_blocks(blocks, names, options, engine, columns, parse_workers=1):
+    # Yields (block, DataFrame or None where the fast engine failed) in file order. With more than
+    # one worker the blocks are parsed in separate processes while the next ones are being read.
+    if parse_workers <= 1:
+        for block in blocks:
+            try:
+                yield block, _parse_block_fast(block, names, options, engine)
+            except (pd.errors.ParserError, ValueError):
+                yield block, None
+        return
+
+    def parsed(block, future):
+        try:
+            return block, future.result()
+        except (pd.errors.ParserError, ValueError):
+            return block, None
+
+    executor = ProcessPoolExecutor(max_workers=parse_workers)
+    try:
+        pending = deque()
+        for block in blocks:
+            pending.append((block, executor.submit(_parse_block_columns, block, names, options, engine, columns)))
+            if len(pending) >= parse_workers * PARSE_BLOCKS_PER_WORKER:
+                yield parsed(*pending.popleft())
+        while pending:
+            yield parsed(*pending.popleft())
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def _parse_block_fallback(block, first_line, names, options, reject_writer):
+    # Python-level parse of a block the fast engine rejected: rows with more fields than the
+    # header go to the reject file with their line numbers, the rest is parsed normally
+    text = block.decode(options['encoding'] or 'utf-8', errors='replace')
+    reader = csv.reader(io.StringIO(text, newline=''), delimiter=options['delimiter'], quotechar=options['quotechar'])
+    good = io.StringIO()
+    writer = csv.writer(good, delimiter=options['delimiter'], quotechar=options['quotechar'], lineterminator='\n')
+    rejected = 0
+    line = first_line
+    for row in reader:
+        if len(row) > len(names):
+            reject_writer().writerow([line, options['delimiter'].join(row)])
+            rejected += 1
+        else:
+            writer.writerow(row)
+        line = first_line + reader.line_num
+    good.seek(0)
+    parse_options = dict(options, encoding=None)
+    return pd.read_csv(good, header=None, names=names, engine='c', **parse_options), rejected
+
+def _iter_csv_frames(input_file, selected_columns, delimiter, quotechar, encoding=None, has_header=True, reject_file=None, engine='c', block_size=CSV_BLOCK_BYTES, metrics=None, parse_workers=1):
+    quotechar = quotechar or '"'
+    options = _csv_read_options(input_file, delimiter, quotechar, encoding, has_header)
+    if encoding and encoding.lower().startswith('utf-16'):
+        # Newlines cannot be found byte-wise in UTF-16, let the Python engine stream it
+        yield from pd.read_csv(input_file, usecols=selected_columns, engine='python', on_bad_lines='warn', chunksize=CSV_CHUNK_SIZE, **options)
+        return
+
+    reject = {'file': None, 'writer': None, 'count': 0}
+
+    def reject_writer():
+        if reject['writer'] is None:
+            reject['file'] = open(reject_file or f"{input_file}_rejects.csv", 'w', newline='', encoding='utf-8')
+            reject['writer'] = csv.writer(reject['file'])
+            reject['writer'].writerow(['line', 'content'])
+        return reject['writer']
+
+    parse_options = {'delimiter': delimiter, 'quotechar': quotechar, 'encoding': encoding}
+    try:
+        with open_input(input_file) as f:
+            if metrics is not None:
+                metrics.watch(getattr(f, 'source', f))
+            if has_header:
+                names, line = _read_csv_header(f, delimiter, quotechar, encoding)
+                line += 1
+            else:
+                names, line = options['names'], 1
+            # Keep the file's column order, like read_csv(usecols=...)
+            columns = names
+            if selected_columns:
+                missing = [column for column in selected_columns if column not in names]
+                if missing:
+                    raise ValueError(f"Columns not found in {input_file}: {missing}")
+                columns = [column for column in names if column in selected_columns]
+
+            if os.path.getsize(input_file) < 2 * block_size:
+                # Starting worker processes costs more than parsing a block or two
+                parse_workers = 1
+            emitted = False
+            blocks = _iter_csv_blocks(f, quotechar.encode('ascii'), block_size)
+            for block, df in _parse_csv_blocks(blocks, names, parse_options, engine, columns, parse_workers):
+                if df is None:
+                    # Malformed rows are sorted out here, the reject file and line numbers stay in one process
+                    df, rejected = _parse_block_fallback(block, line, names, parse_options, reject_writer)
+                    reject['count'] += rejected
+                line += block.count(b'\n')
+                emitted = True
+                yield df[columns]
+            if not emitted:
+                yield pd.DataFrame(columns=columns)
+    finally:
+        if reject['file'] is not None:
+            reject['file'].close()
+            logging.warning(f"{reject['count']} malformed rows of {input_file} written to {reject['file'].name}")
+
+def convert_csv_to_excel(input_file, output_file, selected_columns, delimiter, string_delimiter, encoding=None, has_header=True, engine='c', block_size=CSV_BLOCK_BYTES, metrics=None, cancel=None, parse_workers=1, transform=None):
     try:
-        df = pd.read_csv(input_file, usecols=selected_columns, delimiter=delimiter, quotechar=string_delimiter, engine='python', on_bad_lines='warn')
-        df.to_excel(output_file, index=False, engine='xlsxwriter')
+        # Parse newline-aligned blocks with the fast engine and stream them into a constant_memory
+        # workbook; only a block that fails to parse is re-read row by row
+        reject_file = os.path.splitext(output_file)[0] + '_rejects.csv'
+        writer = None
+        try:
+            chunks = _iter_csv_frames(input_file, None if transform else selected_columns, delimiter, string_delimiter, encoding, has_header, reject_file, engine, block_size, metrics, parse_workers)
+            for chunk in _timed(metrics, chunks, 'read'):
+                with _stage(metrics, 'transform'):
+                    rows_read = len(chunk)
+                    if transform is not None:
+                        chunk = transform.apply(chunk, selected_columns)
+                    rows = _frame_rows(chunk)
+                if writer is None:
+                    writer = _ExcelRowWriter(output_file, chunk.columns)
+                with _stage(metrics, 'write'):
+                    for count, values in enumerate(rows, 1):
+                        writer.write_row(values)
+                        if count % PROGRESS_ROWS == 0:
+                            _check_cancelled(cancel)
+                if metrics is not None:
+                    metrics.add_rows(rows_read)
+                _check_cancelled(cancel)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer.sheets > 1:
+            logging.warning(f"{input_file} exceeded {EXCEL_MAX_ROWS} rows and was split over {writer.sheets} sheets.")
         logging.info(f"File converted successfully from {input_file} to {output_file}")
     except Exception as e:
         logging.error(f"Error converting file from {input_file} to {output_file}: {e}")
         raise e
 
-def convert_json_to_csv(input_file, output_file, selected_columns):
+JSON_BATCH_SIZE = 10000
+JSON_EXTENSIONS = ('.json', '.jsonl')
+
+def _json_loads(line):
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+def _iter_json_records(input_file, max_lines=None, metrics=None, start=0, cursor=None):
+    # cursor (a checkpoint) gets the byte offset after every line read
+    with open_input(input_file) as f:
+        if metrics is not None:
+            metrics.watch(getattr(f, 'source', f))
+        if start and hasattr(f, 'source'):
+            # Decompressed streams cannot all seek, read past what was already converted
+            for _ in iter(lambda: f.read(min(SCAN_BLOCK_BYTES, start - f.tell())), b''):
+                pass
+        else:
+            f.seek(start)
+        offset = start
+        for i, line in enumerate(f):
+            if max_lines is not None and i >= max_lines:
+                break
+            offset += len(line)
+            if cursor is not None:
+                cursor.read_position = offset
+            line = line.strip()
+            if line:
+                yield _json_loads(line)
+
+def _collect_json_paths(record, columns, seen, prefix=''):
+    # Same naming as pd.json_normalize: nested dict keys are joined with '.'
+    for key, value in record.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict) and value:
+            _collect_json_paths(value, columns, seen, f"{path}.")
+        elif path not in seen:
+            seen.add(path)
+            columns.append(path)
+
+def discover_json_columns(input_file, max_lines=None):
+    columns = []
+    seen = set()
+    for record in _iter_json_records(input_file, max_lines):
+        if isinstance(record, dict):
+            _collect_json_paths(record, columns, seen)
+    return columns
+
+def _build_json_projection(columns):
+    # Map every prefix of the wanted paths so flattening only descends into needed branches
+    prefixes = set()
+    for column in columns:
+        parts = column.split('.')
+        for i in range(1, len(parts)):
+            prefixes.add('.'.join(parts[:i]) + '.')
+    return prefixes
+
+def _project_json_record(record, wanted, prefixes, out, prefix=''):
+    for key, value in record.items():
+        path = f"{prefix}{key}"
+        if path in wanted and not (isinstance(value, dict) and value):
+            out[path] = value
+        elif isinstance(value, dict) and f"{path}." in prefixes:
+            _project_json_record(value, wanted, prefixes, out, f"{path}.")
+
+def _iter_json_rows(input_file, columns, max_lines=None, metrics=None, start=0, cursor=None):
+    wanted = set(columns)
+    prefixes = _build_json_projection(columns)
+    for record in _iter_json_records(input_file, max_lines, metrics, start, cursor):
+        values = {}
+        _project_json_record(record, wanted, prefixes, values)
+        yield [values.get(column) for column in columns]
+
+def _json_columns(input_file, selected_columns):
+    # Without a column selection a schema pass over the whole file finds every column first
+    return list(selected_columns) if selected_columns else discover_json_columns(input_file)
+
+def convert_json_to_csv(input_file, output_file, selected_columns, batch_size=JSON_BATCH_SIZE, metrics=None, cancel=None, resume=False, compression_level=None, transform=None):
     try:
-        data = []
-        with open(input_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                data.append(json.loads(line.strip()))
-        df = pd.json_normalize(data)
-        df = df[selected_columns]
-        df.to_csv(output_file, index=False, encoding='utf-8')
+        with _stage(metrics, 'schema'):
+            # Filters and derived columns may use any field, so they need the full schema
+            columns = _json_columns(input_file, None if transform else selected_columns)
+        checkpoint, resumed, f = _open_checkpointed(input_file, output_file, {'columns': columns}, resume and transform is None, compression_level)
+        with f:
+            writer = csv.writer(f)
+            if not resumed:
+                writer.writerow(columns if transform is None else transform.output_columns(columns, selected_columns))
+                if checkpoint is not None:
+                    checkpoint.commit(0, f)
+            start = checkpoint.position if resumed else 0
+            batch = []
+
+            def write_batch():
+                rows = batch
+                if transform is not None:
+                    with _stage(metrics, 'transform'):
+                        rows = _frame_rows(transform.apply(pd.DataFrame(batch, columns=columns), selected_columns))
+                with _stage(metrics, 'write'):
+                    writer.writerows(rows)
+                if metrics is not None:
+                    metrics.add_rows(len(batch))
+                if checkpoint is not None:
+                    checkpoint.commit(checkpoint.read_position, f)
+                batch.clear()
+
+            try:
+                for row in _timed(metrics, _iter_json_rows(input_file, columns, metrics=metrics, start=start, cursor=checkpoint), 'read'):
+                    batch.append(row)
+                    if len(batch) >= batch_size:
+                        write_batch()
+                        _check_cancelled(cancel)
+                write_batch()
+            except BaseException:
+                if checkpoint is not None:
+                    checkpoint.save(f)
+                raise
+        if checkpoint is not None:
+            checkpoint.remove()
         logging.info(f"File converted successfully from {input_file} to {output_file}")
     except Exception as e:
         logging.error(f"Error converting file from {input_file} to {output_file}: {e}")
         raise e
 
-def fragment_file(file_path, fragment_size_mb):
-    try:
-        total_size = os.path.getsize(file_path)
-        fragment_size_bytes = fragment_size_mb * 1024 * 1024
-        num_fragments = (total_size // fragment_size_bytes) + 1
+SCAN_BLOCK_BYTES = 8 * 1024 * 1024
 
-        with open(file_path, 'rb') as f:
-            for i in range(num_fragments):
-                chunk = f.read(fragment_size_bytes)
-                if not chunk:
+def _copy_range(src, dst, offset, count, mm=None):
+    # Let the kernel copy between the two files where it can, otherwise write straight from the mapping
+    src_fd, dst_fd = src.fileno(), dst.fileno()
+    dst.flush()
+    for copy in (getattr(os, 'copy_file_range', None), getattr(os, 'sendfile', None)):
+        if copy is None:
+            continue
+        try:
+            while count > 0:
+                if copy is os.sendfile:
+                    sent = os.sendfile(dst_fd, src_fd, offset, count)
+                else:
+                    sent = os.copy_file_range(src_fd, dst_fd, count, offset)
+                if sent == 0:
                     break
+                offset += sent
+                count -= sent
+            return
+        except OSError:
+            continue
+    if count <= 0:
+        return
+    dst.seek(0, os.SEEK_END)
+    if mm is not None:
+        dst.write(memoryview(mm)[offset:offset + count])
+        return
+    with mmap.mmap(src_fd, 0, access=mmap.ACCESS_READ) as source:
+        dst.write(memoryview(source)[offset:offset + count])
+
+class _RowEnds:
+    # Offsets just past each row of a mapped CSV, in file order, scanned one block at a time.
+    # Newlines inside quoted fields do not end a row; a last row without a newline ends at the end.
+    # Only the row ends of the current block are held, so memory stays flat however many rows a
+    # fragment spans.
+    def __init__(self, mm, quote):
+        self.mm = mm
+        self.quote = quote
+        self.position = 0
+        self.inside = 0
+        self.ends = np.empty(0, dtype=np.int64)
+        self.next = 0  # First row end of the block not handed out yet
+
+    def _scan(self):
+        # Moves on to the next block once the current one is used up, False at the end of the file
+        size = len(self.mm)
+        if self.position >= size:
+            return False
+        block_end = min(self.position + SCAN_BLOCK_BYTES, size)
+        ends, self.inside = _row_ends(self.mm[self.position:block_end], self.quote, self.inside)
+        ends += self.position
+        if block_end == size and (not len(ends) or ends[-1] != size):
+            ends = np.append(ends, size)
+        self.ends, self.next = ends, 0
+        self.position = block_end
+        return True
+
+    def _advance(self, limit, target=None):
+        # Hands out up to limit row ends, stopping after the first one at or after target
+        end, rows = None, 0
+        while rows < limit:
+            if self.next == len(self.ends) and not self._scan():
+                break
+            available = self.ends[self.next:]
+            if not len(available):
+                # A block inside one long row or quoted field ends no row
+                continue
+            count = min(limit - rows, len(available))
+            if target is not None:
+                count = min(count, int(np.searchsorted(available, target)) + 1)
+            end = int(available[count - 1])
+            rows += count
+            self.next += count
+            if target is not None and end >= target:
+                break
+        return end, rows
+
+    def skip(self, count):
+        # (offset after the next count rows, rows passed), fewer rows at the end of the file
+        return self._advance(count)
+
+    def past(self, target):
+        # (end of the first row ending at or after target, rows passed), the file end if none does
+        return self._advance(sys.maxsize, target)
+
+def _fragment_binary(file_path, fragment_size_bytes, cancel=None):
+    total_size = os.path.getsize(file_path)
+    fragments = []
+    with open(file_path, 'rb') as src:
+        for start in range(0, total_size, fragment_size_bytes):
+            _check_cancelled(cancel)
+            count = min(fragment_size_bytes, total_size - start)
+            fragment_path = f"{file_path}_part{len(fragments) + 1}"
+            with open(fragment_path, 'wb') as dst:
+                _copy_range(src, dst, start, count)
+            fragments.append({'path': fragment_path, 'byte_start': start, 'byte_end': start + count})
+    return fragments
 
-                fragment_path = f"{file_path}_part{i + 1}"
-                with open(fragment_path, 'wb') as chunk_file:
-                    chunk_file.write(chunk)
+def _fragment_rows(file_path, fragment_size_bytes, rows_per_fragment, repeat_header, quote=b'"', cancel=None):
+    fragments = []
+    with open(file_path, 'rb') as src:
+        if os.path.getsize(file_path) == 0:
+            return fragments
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            total_size = len(mm)
+            row_ends = _RowEnds(mm, quote)
+            header_end, _ = row_ends.skip(1)
+            header = mm[0:header_end]
+            start = header_end
+            row = 0
+            while start < total_size:
+                _check_cancelled(cancel)
+                if rows_per_fragment:
+                    end, rows = row_ends.skip(rows_per_fragment)
+                else:
+                    # Cut at the first row boundary past the size target, counting the repeated header
+                    end, rows = row_ends.past(start + max(fragment_size_bytes - len(header), 1))
 
-        logging.info(f"File {file_path} fragmented into {num_fragments} parts.")
+                fragment_path = f"{file_path}_part{len(fragments) + 1}"
+                with open(fragment_path, 'wb') as dst:
+                    if repeat_header or not fragments:
+                        dst.write(header)
+                    _copy_range(src, dst, start, end - start, mm)
+                fragments.append({
+                    'path': fragment_path,
+                    'byte_start': start,
+                    'byte_end': end,
+                    'row_start': row,
+                    'row_end': row + rows,
+                })
+                row += rows
+                start = end
+    return fragments
+
+def _read_row(src, quote):
+    # One CSV row, several physical lines when a quoted field holds newlines
+    lines = [src.readline()]
+    inside = lines[0].count(quote) % 2
+    while inside:
+        line = src.readline()
+        if not line:
+            break
+        lines.append(line)
+        inside ^= line.count(quote) % 2
+    return b''.join(lines)
+
+def _fragment_compressed_rows(file_path, fragment_size_bytes, rows_per_fragment, repeat_header, quote=b'"', level=None, cancel=None):
+    # Compressed CSV has no byte offsets to cut at: decompress row by row into fragments
+    # compressed with the same codec. Sizes and byte offsets refer to the uncompressed data.
+    base, codec = split_compression(file_path)
+    fragments = []
+    with open_input(file_path) as src:
+        header = _read_row(src, quote)
+        start = len(header)
+        row = 0
+        line = _read_row(src, quote)
+        while line:
+            _check_cancelled(cancel)
+            fragment_path = f"{base}_part{len(fragments) + 1}{compression_suffix(codec)}"
+            size = rows = 0
+            with _open_binary_output(fragment_path, level) as dst:
+                if repeat_header or not fragments:
+                    dst.write(header)
+                    size += len(header)
+                while line:
+                    dst.write(line)
+                    size += len(line)
+                    rows += 1
+                    line = _read_row(src, quote)
+                    if (rows_per_fragment and rows >= rows_per_fragment) or (fragment_size_bytes and size >= fragment_size_bytes):
+                        break
+            end = start + size - (len(header) if repeat_header or not fragments else 0)
+            fragments.append({
+                'path': fragment_path,
+                'byte_start': start,
+                'byte_end': end,
+                'row_start': row,
+                'row_end': row + rows,
+            })
+            row += rows
+            start = end
+    return fragments
+
+def _fragment_columnar(file_path, fragment_size_bytes, rows_per_fragment, compression=None, cancel=None):
+    # Parquet and Arrow fragments are complete files of whole batches, each readable on its own.
+    # A size target becomes a row count from the average size of a row on disk.
+    pa = _require_pyarrow()
+    output_format = 'Parquet' if file_path.lower().endswith('.parquet') else 'Arrow'
+    if output_format == 'Parquet':
+        import pyarrow.parquet as pq
+        total_rows = pq.ParquetFile(file_path).metadata.num_rows
+    else:
+        with pa.memory_map(file_path, 'r') as source:
+            reader = pa.ipc.open_file(source)
+            total_rows = sum(reader.get_batch(index).num_rows for index in range(reader.num_record_batches))
+    if not rows_per_fragment:
+        row_bytes = os.path.getsize(file_path) / max(total_rows, 1)
+        rows_per_fragment = max(int(fragment_size_bytes / row_bytes), 1)
+
+    root, extension = os.path.splitext(file_path)
+    fragments = []
+    writer = None
+    row = 0
+    try:
+        for batch in _iter_columnar_batches(file_path, None):
+            while len(batch):
+                _check_cancelled(cancel)
+                if writer is None:
+                    writer = _ColumnarWriter(f"{root}_part{len(fragments) + 1}{extension}", output_format, compression)
+                    fragments.append({'path': writer.output_file, 'row_start': row, 'row_end': row})
+                take = min(len(batch), rows_per_fragment - (fragments[-1]['row_end'] - fragments[-1]['row_start']))
+                writer.write_batch(batch.slice(0, take))
+                batch = batch.slice(take)
+                row += take
+                fragments[-1]['row_end'] = row
+                if row - fragments[-1]['row_start'] == rows_per_fragment:
+                    writer.close()
+                    writer = None
+    finally:
+        if writer is not None:
+            writer.close()
+    return fragments
+
+def fragment_file(file_path, fragment_size_mb=None, rows_per_fragment=None, repeat_header=True, write_index=True, cancel=None, compression_level=None, quotechar='"', compression=None):
+    # CSV files are only cut between rows, never at a newline inside a quoted field; Parquet and
+    # Arrow files are split into smaller files of the same format, written with compression
+    try:
+        if not fragment_size_mb and not rows_per_fragment:
+            raise ValueError("Either a fragment size or a number of rows per fragment is required.")
+        fragment_size_bytes = int(fragment_size_mb * 1024 * 1024) if fragment_size_mb else None
+        quote = quotechar.encode('ascii')
+
+        base, codec = split_compression(file_path)
+        if base.lower().endswith('.csv') and codec is not None:
+            fragments = _fragment_compressed_rows(file_path, fragment_size_bytes, rows_per_fragment, repeat_header, quote, compression_level, cancel)
+        elif base.lower().endswith('.csv'):
+            fragments = _fragment_rows(file_path, fragment_size_bytes, rows_per_fragment, repeat_header, quote, cancel)
+        elif base.lower().endswith(COLUMNAR_EXTENSIONS):
+            fragments = _fragment_columnar(file_path, fragment_size_bytes, rows_per_fragment, compression, cancel)
+        else:
+            # Binary outputs such as workbooks have no rows to align on
+            if not fragment_size_bytes:
+                logging.warning(f"Row-based fragmentation is only supported for CSV, Parquet and Arrow files, {file_path} was left whole.")
+                return []
+            fragments = _fragment_binary(file_path, fragment_size_bytes, cancel)
+
+        if write_index:
+            write_json(f"{file_path}_index.json", {'source': file_path, 'fragments': fragments}, indent=2)
+
+        logging.info(f"File {file_path} fragmented into {len(fragments)} parts.")
+        return fragments
     except Exception as e:
         logging.error(f"Error fragmenting file {file_path}: {e}")
         raise e
 
-def merge_sheets(files, output_file):
+MERGE_SHEET_NAME = 'MergedSheet'
+MERGE_MEMORY_MB = 512  # Rows held in memory before a sorted run is spilled to disk
+MERGE_FAN_IN = 64  # Runs combined by one k-way merge, more are merged in several passes
+MERGE_SPILL_ROWS = 4096  # Rows per pickled batch in a run file, what each open run holds in memory
+MERGE_SIZE_SAMPLE = 1000  # Rows between row size measurements
+
+def _read_header(file):
+    lower = split_compression(file)[0].lower()
+    if lower.endswith('.xlsx'):
+        rows = _iter_excel_rows(file, None)
+        try:
+            return next(rows, [])
+        finally:
+            rows.close()
+    if lower.endswith('.xls'):
+        return pd.read_excel(file, nrows=0).columns.tolist()
+    return pd.read_csv(file, nrows=0).columns.tolist()
+
+def _iter_merge_rows(file, columns):
+    lower = split_compression(file)[0].lower()
+    if lower.endswith('.xlsx'):
+        rows = _iter_excel_rows(file, None)
+        header = next(rows, [])
+        positions = {value: index for index, value in enumerate(columns)}
+        targets = [positions.get(value) for value in header]
+        for values in rows:
+            row = [None] * len(columns)
+            for target, value in zip(targets, values):
+                if target is not None:
+                    row[target] = value
+            yield row
+        return
+    if lower.endswith('.xls'):
+        chunks = [pd.read_excel(file)]
+    else:
+        chunks = pd.read_csv(file, chunksize=CSV_CHUNK_SIZE)
+    for chunk in chunks:
+        yield from _frame_rows(chunk.reindex(columns=columns))
+
+def _sort_value(value):
+    # Total order over the mixed values of merged files: numbers, then dates, then text, blanks last
+    if value is None or (isinstance(value, float) and value != value):
+        return (3, 0)
+    if isinstance(value, numbers.Real):
+        return (0, value)
+    if hasattr(value, 'isoformat'):
+        return (1, value.isoformat())
+    return (2, str(value))
+
+def _row_key(positions):
+    def key(row):
+        return tuple(_sort_value(row[position]) for position in positions)
+    return key
+
+def _write_run(rows, directory):
+    fd, path = tempfile.mkstemp(suffix='.run', dir=directory)
+    with os.fdopen(fd, 'wb') as f:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= MERGE_SPILL_ROWS:
+                pickle.dump(batch, f, pickle.HIGHEST_PROTOCOL)
+                batch = []
+        if batch:
+            pickle.dump(batch, f, pickle.HIGHEST_PROTOCOL)
+    return path
+
+def _read_run(path):
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                break
+            yield from batch
+    os.remove(path)
+
+def _external_sort(rows, key, directory, memory_bytes, cancel=None):
+    # Stable sort in bounded memory: rows are sorted in runs of about memory_bytes, which are
+    # spilled to directory and combined by k-way merges. Input that fits is sorted in memory.
+    runs = []
+    run, size, row_size = [], 0, 0
+    for count, row in enumerate(_checked_rows(rows, cancel)):
+        if count % MERGE_SIZE_SAMPLE == 0:
+            # The row, its values and the key list.sort() keeps for it while sorting
+            sort_key = key(row)
+            row_size = sum(sys.getsizeof(part) for part in (row, sort_key, *row, *sort_key))
+        run.append(row)
+        size += row_size
+        if size >= memory_bytes:
+            run.sort(key=key)
+            runs.append(_write_run(run, directory))
+            run, size = [], 0
+    run.sort(key=key)
+    if not runs:
+        yield from run
+        return
+    if run:
+        runs.append(_write_run(run, directory))
+    del run
+    logging.info(f"Merging {len(runs)} sorted runs spilled to {directory}")
+    # heapq.merge takes ties from the earlier run first, merging neighbouring runs keeps that order
+    while len(runs) > MERGE_FAN_IN:
+        runs = [
+            _write_run(_checked_rows(heapq.merge(*map(_read_run, runs[start:start + MERGE_FAN_IN]), key=key), cancel), directory)
+            for start in range(0, len(runs), MERGE_FAN_IN)
+        ]
+    yield from heapq.merge(*map(_read_run, runs), key=key)
+
+def _drop_duplicates(rows, key):
+    # rows come ordered so that duplicates are adjacent; the first of each is kept
+    previous = None
+    for row in rows:
+        current = key(row)
+        if current != previous:
+            previous = current
+            yield row
+
+def _ordered_merge_rows(rows, columns, sort_keys, dedupe_keys, directory, memory_bytes, cancel=None):
+    position = {column: index for index, column in enumerate(columns)}
+    missing = [column for column in list(sort_keys or []) + list(dedupe_keys or []) if column not in position]
+    if missing:
+        raise ValueError(f"Merge keys not found in any input: {missing}")
+    sort_keys, dedupe_keys = list(sort_keys or []), list(dedupe_keys or [])
+    if dedupe_keys and sort_keys and not set(sort_keys) <= set(dedupe_keys):
+        # Duplicates would not be adjacent in the requested order, drop them in a first sort by their own keys
+        dedupe_key = _row_key([position[column] for column in dedupe_keys])
+        rows = _drop_duplicates(_external_sort(rows, dedupe_key, directory, memory_bytes, cancel), dedupe_key)
+        dedupe_keys = []
+    # Sorting by the sort keys and then the remaining dedupe keys puts duplicates next to each other
+    order = sort_keys + [column for column in dedupe_keys if column not in sort_keys]
+    rows = _external_sort(rows, _row_key([position[column] for column in order]), directory, memory_bytes, cancel)
+    if dedupe_keys:
+        rows = _drop_duplicates(rows, _row_key([position[column] for column in dedupe_keys]))
+    return rows
+
+def mergeable_files(files):
+    # Workbooks are zip or OLE containers read in place, only CSV can come compressed
+    supported = []
+    for file in files:
+        base, codec = split_compression(file)
+        if base.lower().endswith('.csv') or (codec is None and base.lower().endswith(('.xlsx', '.xls'))):
+            supported.append(file)
+        else:
+            logging.warning(f"File {file} is not a supported format and will be skipped.")
+    return supported
+
+def merge_columns(files):
+    # Read only the headers so the column union is known before any row is written
+    columns = []
+    seen = set()
+    for file in mergeable_files(files):
+        for column in _read_header(file):
+            if column not in seen:
+                seen.add(column)
+                columns.append(column)
+    return columns
+
+def merge_sheets(files, output_file, cancel=None, sort_keys=None, dedupe_keys=None, memory_mb=MERGE_MEMORY_MB, temp_dir=None):
+    # sort_keys orders the merged rows by those columns, dedupe_keys keeps only the first row of
+    # each combination of their values. Either one sorts externally within about memory_mb, with
+    # runs spilled to temp_dir (the system temp folder by default).
     try:
-        combined_df = pd.DataFrame()
-        
-        for file in files:
-            if file.endswith('.xlsx') or file.endswith('.xls'):
-                df = pd.read_excel(file)
-            elif file.endswith('.csv'):
-                df = pd.read_csv(file)
+        supported = mergeable_files(files)
+        columns = merge_columns(supported)
+
+        ordered = bool(sort_keys or dedupe_keys)
+        spill = tempfile.TemporaryDirectory(prefix='conversor_merge_', dir=temp_dir) if ordered else nullcontext()
+        with spill as directory:
+            rows = (row for file in supported for row in _iter_merge_rows(file, columns))
+            if ordered:
+                rows = _ordered_merge_rows(rows, columns, sort_keys, dedupe_keys, directory, memory_mb * 1024 * 1024, cancel)
+
+            if split_compression(output_file)[0].lower().endswith('.csv'):
+                writer = _CsvRowWriter(output_file, columns)
             else:
-                logging.warning(f"File {file} is not a supported format and will be skipped.")
-                continue
-            combined_df = pd.concat([combined_df, df], ignore_index=True)
-        
-        # Use xlsxwriter to enable ZIP64
-        with pd.ExcelWriter(output_file, engine='xlsxwriter') as writer:
-            writer.book.use_zip64()
-            combined_df.to_excel(writer, sheet_name='MergedSheet', index=False)
-        
-        logging.info(f"All sheets merged successfully into {output_file} in a single sheet.")
+                # xlsxwriter with ZIP64 and constant memory, rolling over to a new sheet at Excel's row limit
+                writer = _ExcelRowWriter(output_file, columns, MERGE_SHEET_NAME)
+            try:
+                for count, row in enumerate(rows, 1):
+                    writer.write_row(row)
+                    if count % PROGRESS_ROWS == 0:
+                        _check_cancelled(cancel)
+            finally:
+                writer.close()
+
+        logging.info(f"All sheets merged successfully into {output_file} ({writer.sheets} sheet(s)).")
     except Exception as e:
         logging.error(f"Error merging sheets into {output_file}: {e}")
-        raise e
\ No newline at end of file
+        raise e
+
+COLUMNAR_BATCH_ROWS = 128 * 1024
+COLUMNAR_EXTENSIONS = ('.parquet', '.feather', '.arrow')
+PARQUET_COMPRESSIONS = ['snappy', 'zstd', 'gzip', 'none']
+ARROW_COMPRESSIONS = ['zstd', 'lz4', 'none']
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Parquet and Arrow conversions need the optional 'pyarrow' package (pip install pyarrow).")
+    return pyarrow
+
+def _batched_frames(rows, columns, batch_rows, cancel=None):
+    batch = []
+    emitted = False
+    for row in _checked_rows(rows, cancel):
+        batch.append(row)
+        if len(batch) >= batch_rows:
+            yield pd.DataFrame(batch, columns=columns)
+            batch = []
+            emitted = True
+    if batch or not emitted:
+        yield pd.DataFrame(batch, columns=columns)
+
+def _iter_source_frames(input_file, source, selected_columns, delimiter=',', string_delimiter='"', encoding=None, has_header=True, reject_file=None, batch_rows=COLUMNAR_BATCH_ROWS, metrics=None, parse_workers=1, cancel=None):
+    if source == 'CSV':
+        yield from _iter_csv_frames(input_file, selected_columns, delimiter, string_delimiter, encoding, has_header, reject_file, metrics=metrics, parse_workers=parse_workers)
+    elif source == 'Excel':
+        rows = _iter_excel_rows(input_file, selected_columns, metrics=metrics)
+        try:
+            header = next(rows, [])
+            yield from _batched_frames(rows, header, batch_rows, cancel)
+        finally:
+            rows.close()
+    elif source == 'JSON':
+        columns = _json_columns(input_file, selected_columns)
+        yield from _batched_frames(_iter_json_rows(input_file, columns, metrics=metrics), columns, batch_rows, cancel)
+    else:
+        raise ValueError(f"Unsupported source format '{source}' for {input_file}")
+
+def _text_value(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, float) and value != value:
+        return None
+    return str(value)
+
+def _wider_type(pa, old, new):
+    # Type holding the values of both: null takes the other type, mixed integers and floats
+    # become float64, text or binary with 32- and 64-bit offsets take the 64-bit variant and
+    # any other conflict becomes text
+    if old == new or pa.types.is_null(new):
+        return old
+    if pa.types.is_null(old):
+        return new
+    if pa.types.is_integer(old) and pa.types.is_integer(new):
+        return pa.int64()
+    if (pa.types.is_integer(old) or pa.types.is_floating(old)) and (pa.types.is_integer(new) or pa.types.is_floating(new)):
+        return pa.float64()
+    large = pa.types.is_large_string(old) or pa.types.is_large_string(new) or pa.types.is_large_binary(old) or pa.types.is_large_binary(new)
+    if all(pa.types.is_binary(value) or pa.types.is_large_binary(value) for value in (old, new)):
+        return pa.large_binary() if large else pa.binary()
+    return pa.large_string() if large else pa.string()
+
+class _ColumnarWriter:
+    # Parquet or Arrow IPC writer. The first batch sets the schema; a later batch whose types do
+    # not fit (an int column that gets floats, an empty one that gets values) widens it and the
+    # batches written so far are rewritten once with the wider schema.
+    def __init__(self, output_file, output_format, compression=None):
+        self.pa = _require_pyarrow()
+        self.output_file = output_file
+        self.output_format = output_format
+        self.compression = None if compression in (None, 'none') else compression
+        self.schema = None
+        self.writer = None
+
+    def _table(self, df):
+        pa = self.pa
+        try:
+            return pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Columns mixing numbers and text (common in spreadsheets) are stored as text
+            df = df.copy()
+            for column in df.columns[df.dtypes == object]:
+                df[column] = df[column].map(_text_value)
+            return pa.Table.from_pandas(df, preserve_index=False)
+
+    def _open(self, schema):
+        pa = self.pa
+        if self.output_format == 'Parquet':
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(self.output_file, schema, compression=self.compression or 'none')
+        options = pa.ipc.IpcWriteOptions(compression=self.compression)
+        return pa.ipc.new_file(self.output_file, schema, options=options)
+
+    def _written_batches(self, path):
+        pa = self.pa
+        if self.output_format == 'Parquet':
+            import pyarrow.parquet as pq
+            yield from pq.ParquetFile(path).iter_batches(batch_size=COLUMNAR_BATCH_ROWS)
+            return
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for index in range(reader.num_record_batches):
+                yield reader.get_batch(index)
+
+    def _widen(self, schema):
+        logging.info(f"Widening the column types of {self.output_file} to {schema.types}, rewriting the rows written so far")
+        self.writer.close()
+        temp_path = f"{self.output_file}.widen"
+        os.replace(self.output_file, temp_path)
+        self.schema = schema
+        self.writer = self._open(schema)
+        try:
+            for batch in self._written_batches(temp_path):
+                self._write_table(self.pa.Table.from_batches([batch]).cast(schema))
+        finally:
+            os.remove(temp_path)
+
+    def _write_table(self, table):
+        if self.output_format == 'Parquet':
+            self.writer.write_table(table, row_group_size=COLUMNAR_BATCH_ROWS)
+        else:
+            self.writer.write_table(table, max_chunksize=COLUMNAR_BATCH_ROWS)
+
+    def write(self, df):
+        pa = self.pa
+        table = self._table(df)
+        if self.schema is None:
+            self.schema = table.schema
+            self.writer = self._open(self.schema)
+        elif table.schema.types != self.schema.types:
+            # The pandas metadata of the first batch would describe the old types, so it is dropped
+            schema = pa.schema([pa.field(old.name, _wider_type(pa, old.type, new.type)) for old, new in zip(self.schema, table.schema)])
+            if schema.types != self.schema.types:
+                self._widen(schema)
+        self._write_table(table.cast(self.schema))
+
+    def write_batch(self, batch):
+        # Batches that already share one schema, e.g. those of a file being fragmented
+        if self.writer is None:
+            self.schema = batch.schema
+            self.writer = self._open(self.schema)
+        self._write_table(self.pa.Table.from_batches([batch]))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+def convert_to_columnar(input_file, output_file, selected_columns, source, output_format='Parquet', compression=None, delimiter=',', string_delimiter='"', encoding=None, has_header=True, metrics=None, cancel=None, parse_workers=1, transform=None):
+    try:
+        writer = _ColumnarWriter(output_file, output_format, compression)
+        reject_file = os.path.splitext(output_file)[0] + '_rejects.csv'
+        try:
+            frames = _iter_source_frames(input_file, source, None if transform else selected_columns, delimiter, string_delimiter, encoding, has_header, reject_file, metrics=metrics, parse_workers=parse_workers, cancel=cancel)
+            for df in _timed(metrics, frames, 'read'):
+                rows_read = len(df)
+                if transform is not None:
+                    with _stage(metrics, 'transform'):
+                        df = transform.apply(df, selected_columns)
+                with _stage(metrics, 'write'):
+                    writer.write(df)
+                if metrics is not None:
+                    metrics.add_rows(rows_read)
+                _check_cancelled(cancel)
+        finally:
+            writer.close()
+        logging.info(f"File converted successfully from {input_file} to {output_file}")
+    except Exception as e:
+        logging.error(f"Error converting file from {input_file} to {output_file}: {e}")
+        raise e
+
+def _iter_columnar_batches(input_file, selected_columns, batch_rows=None, metrics=None, skip_batches=0):
+    pa = _require_pyarrow()
+    columns = list(selected_columns) if selected_columns else None
+    emitted = False
+    if input_file.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(input_file)
+        schema = parquet.schema_arrow
+        if metrics is not None:
+            metrics.add_total_rows(parquet.metadata.num_rows)
+        # Read one row group's worth at a time; only the selected columns are decoded
+        if batch_rows is None:
+            batch_rows = parquet.metadata.row_group(0).num_rows if parquet.metadata.num_row_groups else COLUMNAR_BATCH_ROWS
+        batches = parquet.iter_batches(batch_size=max(batch_rows, 1), columns=columns)
+        for index, batch in enumerate(batches):
+            if index < skip_batches:
+                # Row groups hold no offsets to seek to, batches already written are decoded and dropped
+                continue
+            emitted = True
+            yield batch
+    else:
+        with pa.memory_map(input_file, 'r') as source:
+            reader = pa.ipc.open_file(source)
+            schema = reader.schema
+            if metrics is not None:
+                metrics.add_total_rows(sum(reader.get_batch(index).num_rows for index in range(reader.num_record_batches)))
+            for index in range(skip_batches, reader.num_record_batches):
+                batch = reader.get_batch(index)
+                emitted = True
+                yield batch.select(columns) if columns else batch
+    if not emitted:
+        # Empty inputs still produce a header
+        if columns:
+            schema = pa.schema([schema.field(column) for column in columns])
+        yield pa.RecordBatch.from_pylist([], schema=schema)
+
+def convert_columnar(input_file, output_file, selected_columns, output_format='CSV', metrics=None, cancel=None, resume=False, compression_level=None, transform=None):
+    try:
+        read_columns = None if transform else selected_columns
+        if output_format == 'CSV':
+            # checkpoint.position counts the record batches already written, which a filter does not change
+            settings = {'columns': selected_columns, 'transform': transform.settings() if transform else None}
+            checkpoint, resumed, f = _open_checkpointed(input_file, output_file, settings, resume, compression_level)
+            with f:
+                written = checkpoint.position if resumed else 0
+                batches = _iter_columnar_batches(input_file, read_columns, metrics=metrics, skip_batches=written)
+                header = not resumed
+                try:
+                    for batch in _timed(metrics, batches, 'read'):
+                        with _stage(metrics, 'transform'):
+                            df = batch.to_pandas()
+                            rows_read = len(df)
+                            if transform is not None:
+                                df = transform.apply(df, selected_columns)
+                        with _stage(metrics, 'write'):
+                            df.to_csv(f, index=False, header=header)
+                        if metrics is not None:
+                            metrics.add_rows(rows_read)
+                        header = False
+                        written += 1
+                        if checkpoint is not None:
+                            checkpoint.commit(written, f)
+                        _check_cancelled(cancel)
+                except BaseException:
+                    if checkpoint is not None:
+                        checkpoint.save(f)
+                    raise
+            if checkpoint is not None:
+                checkpoint.remove()
+        else:
+            batches = _timed(metrics, _iter_columnar_batches(input_file, read_columns, metrics=metrics), 'read')
+            writer = None
+            try:
+                for batch in batches:
+                    with _stage(metrics, 'transform'):
+                        df = batch.to_pandas()
+                        rows_read = len(df)
+                        if transform is not None:
+                            df = transform.apply(df, selected_columns)
+                        rows = _frame_rows(df)
+                    if writer is None:
+                        writer = _ExcelRowWriter(output_file, df.columns)
+                    with _stage(metrics, 'write'):
+                        for count, values in enumerate(rows, 1):
+                            writer.write_row(values)
+                            if count % PROGRESS_ROWS == 0:
+                                _check_cancelled(cancel)
+                    if metrics is not None:
+                        metrics.add_rows(rows_read)
+                    _check_cancelled(cancel)
+            finally:
+                if writer is not None:
+                    writer.close()
+        logging.info(f"File converted successfully from {input_file} to {output_file}")
+    except Exception as e:
+        logging.error(f"Error converting file from {input_file} to {output_file}: {e}")
+        raise e
+
+@dataclass
+class ConversionJob:
+    input_file: str
+    output_file: str
+    conversion_type: str
+    selected_columns: list = field(default_factory=list)
+    delimiter: str = ','
+    string_delimiter: str = '"'
+    encoding: str = None
+    has_header: bool = None  # None sniffs it along with the delimiter, a given delimiter assumes a header
+    compression: str = None
+    compression_level: int = None
+    sheet_columns: dict = None
+    fragment_size_mb: float = None
+    fragment_rows: int = None
+    resume: bool = True
+    row_filter: str = None  # pandas expression rows must match, see RowTransform
+    derived_columns: dict = None  # name -> pandas expression, appended to the output
+    parse_workers: int = None  # Processes parsing one CSV or exporting its sheets; None lets run_jobs hand out spare cores
+    excel_engine: str = 'openpyxl'  # Excel to CSV: 'openpyxl' streams rows, 'pandas' loads the sheet at once
+
+# Conversions offered for each input extension, the first one is the default
+CONVERSION_TYPES = {
+    '.xlsx': ['Excel to CSV', 'Excel to Parquet', 'Excel to Arrow'],
+    '.csv': ['CSV to Excel', 'CSV to Parquet', 'CSV to Arrow'],
+    '.json': ['JSON to CSV', 'JSON to Parquet', 'JSON to Arrow'],
+    '.jsonl': ['JSON to CSV', 'JSON to Parquet', 'JSON to Arrow'],
+    '.parquet': ['Parquet to CSV', 'Parquet to Excel'],
+    '.feather': ['Arrow to CSV', 'Arrow to Excel'],
+    '.arrow': ['Arrow to CSV', 'Arrow to Excel'],
+}
+
+OUTPUT_EXTENSIONS = {'CSV': '.csv', 'Parquet': '.parquet', 'Arrow': '.arrow'}
+
+# Inputs whose content is read as a stream can also arrive compressed (feed.csv.gz, feed.jsonl.zst)
+STREAMED_EXTENSIONS = ('.csv', '.json', '.jsonl')
+
+def conversion_types_for(file_path):
+    base, codec = split_compression(file_path)
+    extension = os.path.splitext(base)[1].lower()
+    if codec is not None and extension not in STREAMED_EXTENSIONS:
+        return []
+    return CONVERSION_TYPES.get(extension, [])
+
+def output_path_for(input_file, output_folder, conversion_type, excel_format='XLSX', compression=None):
+    # compression only applies to CSV outputs, which then get the codec's suffix
+    file_name = os.path.basename(split_compression(input_file)[0])
+    target = conversion_type.split(' to ')[1]
+    output_extension = OUTPUT_EXTENSIONS.get(target) or ('.xls' if excel_format == 'XLS' else '.xlsx')
+    if target == 'CSV' and compression in COMPRESSION_SUFFIXES.values():
+        output_extension += compression_suffix(compression)
+    return os.path.join(output_folder, os.path.splitext(file_name)[0] + '_converted' + output_extension)
+
+def run_conversion_job(job, report=None, cancel=None):
+    # report receives progress events and a final job summary (see ConversionMetrics); without
+    # one the job runs uninstrumented. cancel is an Event that stops the job between chunks.
+    _check_cancelled(cancel)
+    if job.conversion_type not in conversion_types_for(job.input_file):
+        raise ValueError(f"Unsupported conversion '{job.conversion_type}' for {job.input_file}")
+    source, target = job.conversion_type.split(' to ')
+    metrics = ConversionMetrics(job.input_file, report) if report is not None else None
+    transform = RowTransform.for_job(job)
+
+    delimiter, string_delimiter, encoding, has_header = job.delimiter, job.string_delimiter, job.encoding, job.has_header
+    if source == 'CSV' and delimiter is None:
+        with _stage(metrics, 'sniff'):
+            dialect = sniff_csv_dialect(job.input_file)
+        delimiter, encoding = dialect['delimiter'], dialect['encoding']
+        string_delimiter = string_delimiter or dialect['quotechar']
+        if has_header is None:
+            has_header = dialect['has_header']
+    if has_header is None:
+        has_header = True
+    if source == 'CSV' and metrics is not None and split_compression(job.input_file)[1] is None:
+        # A row index left by the preview gives the exact row count for free, no file is scanned for it
+        index = load_row_index(job.input_file, string_delimiter or '"', has_header)
+        if index is not None:
+            metrics.add_total_rows(index.rows)
+
+    outputs = [job.output_file]
+    if source == 'Excel' and job.sheet_columns:
+        outputs = convert_excel_sheets(job.input_file, job.output_file, job.sheet_columns, target, job.compression, max_workers=job.parse_workers or 1, metrics=metrics, cancel=cancel, compression_level=job.compression_level, transform=transform)
+    elif target in ('Parquet', 'Arrow'):
+        convert_to_columnar(job.input_file, job.output_file, job.selected_columns, source, target, job.compression, delimiter, string_delimiter, encoding, has_header, metrics=metrics, cancel=cancel, parse_workers=job.parse_workers or 1, transform=transform)
+    elif source in ('Parquet', 'Arrow'):
+        convert_columnar(job.input_file, job.output_file, job.selected_columns, target, metrics=metrics, cancel=cancel, resume=job.resume, compression_level=job.compression_level, transform=transform)
+    elif source == 'Excel':
+        convert_excel(job.input_file, job.output_file, job.selected_columns, job.excel_engine, metrics=metrics, cancel=cancel, resume=job.resume, compression_level=job.compression_level, transform=transform)
+    elif source == 'CSV':
+        convert_csv_to_excel(job.input_file, job.output_file, job.selected_columns, delimiter, string_delimiter, encoding=encoding, has_header=has_header, metrics=metrics, cancel=cancel, parse_workers=job.parse_workers or 1, transform=transform)
+    else:
+        convert_json_to_csv(job.input_file, job.output_file, job.selected_columns, metrics=metrics, cancel=cancel, resume=job.resume, compression_level=job.compression_level, transform=transform)
+
+    if job.fragment_size_mb or job.fragment_rows:
+        with _stage(metrics, 'fragment'):
+            for output_file in outputs:
+                fragment_file(output_file, job.fragment_size_mb, rows_per_fragment=job.fragment_rows, cancel=cancel, compression_level=job.compression_level, compression=job.compression)
+    if metrics is not None:
+        report(metrics.summary(outputs))
+    return outputs
+
+def _job_size(job):
+    try:
+        return os.path.getsize(job.input_file)
+    except OSError:
+        return 0
+
+# Event queue and cancel event of a worker process, set by the pool initializer
+_worker_events = None
+_worker_cancel = None
+
+def _init_worker(events, cancel):
+    global _worker_events, _worker_cancel
+    _worker_events = events
+    _worker_cancel = cancel
+
+def _run_worker_job(job):
+    return run_conversion_job(job, _worker_events.put if _worker_events is not None else None, _worker_cancel)
+
+def _forward_events(events, callback):
+    for event in iter(events.get, None):
+        callback(event)
+
+def run_jobs(jobs, max_workers=None, progress_callback=None, manifest=None, metrics_callback=None, cancel=None):
+    # metrics_callback turns instrumentation on and receives every job's progress and summary
+    # events in the calling process, e.g. log_metrics. cancel stops running jobs at their next
+    # chunk and skips queued ones; it must be a multiprocessing.Event unless max_workers is 1.
+    ordered = sorted(jobs, key=_job_size, reverse=True)
+    total = len(ordered)
+    # Fewer files than workers: the spare cores parse blocks of the CSV inputs in parallel
+    share = (max_workers or os.cpu_count() or 1) // max(total, 1)
+    if share > 1:
+        ordered = [job if job.parse_workers else replace(job, parse_workers=share) for job in ordered]
+    failed = []
+
+    def finished(done, job, outputs, error):
+        if isinstance(error, ConversionCancelled):
+            logging.warning(f"Cancelled conversion of {os.path.basename(job.input_file)}")
+            failed.append(job)
+        elif error is not None:
+            logging.error(f"Failed to convert {os.path.basename(job.input_file)}: {error}")
+            failed.append(job)
+        elif manifest is not None:
+            manifest.record(job, outputs)
+        if progress_callback:
+            progress_callback(done, total)
+
+    if max_workers == 1:
+        for done, job in enumerate(ordered, 1):
+            try:
+                outputs = run_conversion_job(job, metrics_callback, cancel)
+                finished(done, job, outputs, None)
+            except Exception as e:
+                finished(done, job, None, e)
+        return failed
+
+    manager = events = forwarder = None
+    if metrics_callback is not None:
+        # Workers put events on a managed queue that a thread here hands to the callback. Its
+        # put() returns once the event is stored, so a job's summary is queued before its result.
+        import multiprocessing
+        manager = multiprocessing.Manager()
+        events = manager.Queue()
+        forwarder = threading.Thread(target=_forward_events, args=(events, metrics_callback), daemon=True)
+        forwarder.start()
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(events, cancel)) as executor:
+            futures = {executor.submit(_run_worker_job, job): job for job in ordered}
+            for done, future in enumerate(as_completed(futures), 1):
+                if cancel is not None and cancel.is_set():
+                    for pending in futures:
+                        pending.cancel()
+                error = ConversionCancelled("Conversion cancelled") if future.cancelled() else future.exception()
+                finished(done, futures[future], None if error else future.result(), error)
+    finally:
+        if manager is not None:
+            events.put(None)
+            forwarder.join()
+            manager.shutdown()
+    return failed
@@ -0,0 +1,91 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from storage import path_key, write_json
+
+CACHE_MAX_ENTRIES = 2000
+CACHE_FILE_NAME = 'header_cache.json'
+
+def default_cache_dir():
+    if os.environ.get('CONVERSOR_CACHE_DIR'):
+        return os.environ['CONVERSOR_CACHE_DIR']
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'conversor')
+
+class HeaderCache:
+    # Column lists, sample rows and dialects of input files, keyed by (path, size, mtime, delimiter).
+    # Entries whose file changed size or mtime are dropped on lookup; the least recently used
+    # entries are evicted once max_entries is reached.
+    def __init__(self, path=None, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path or os.path.join(default_cache_dir(), CACHE_FILE_NAME)
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            self.entries = OrderedDict((entry['key'], entry) for entry in stored.get('entries', []))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logging.warning(f"Ignoring unreadable header cache {self.path}: {e}")
+            self.entries = OrderedDict()
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            stored = {'entries': list(self.entries.values())}
+            self.dirty = False
+        try:
+            write_json(self.path, stored)
+        except OSError as e:
+            logging.warning(f"Could not save header cache {self.path}: {e}")
+
+    @staticmethod
+    def _key(file_path, delimiter, quotechar, sheet_name=None):
+        parts = [path_key(file_path), delimiter, quotechar]
+        if sheet_name is not None:
+            parts.append(sheet_name)
+        return json.dumps(parts)
+
+    def get(self, file_path, delimiter=None, quotechar=None, sheet_name=None):
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        key = self._key(file_path, delimiter, quotechar, sheet_name)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+                del self.entries[key]
+                self.dirty = True
+                return None
+            self.entries.move_to_end(key)
+            return entry['data']
+
+    def put(self, file_path, delimiter, quotechar, data, sheet_name=None):
+        stat = os.stat(file_path)
+        key = self._key(file_path, delimiter, quotechar, sheet_name)
+        with self.lock:
+            self.entries[key] = {'key': key, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'data': data}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.dirty = True
+
+    def get_or_load(self, file_path, delimiter, quotechar, loader, sheet_name=None):
+        data = self.get(file_path, delimiter, quotechar, sheet_name)
+        if data is None:
+            data = loader(file_path, delimiter, quotechar)
+            self.put(file_path, delimiter, quotechar, data, sheet_name)
+        return data
@@ -1,64 +1,258 @@
 import sys
 import os
+import multiprocessing
 import threading
-import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QLabel, QLineEdit, 
     QPushButton, QFileDialog, QComboBox, QMessageBox, QCheckBox, 
-    QScrollArea, QFormLayout, QTableWidget, QTableWidgetItem, QHBoxLayout, QTabWidget, QToolButton, QStyle, QTabBar, QProgressDialog, QDialog, QDialogButtonBox, QRadioButton, QButtonGroup, QGroupBox
+    QScrollArea, QListView, QListWidget, QListWidgetItem, QTableView, QHBoxLayout, QTabWidget, QToolButton, QStyle, QTabBar, QProgressDialog, QDialog, QDialogButtonBox, QRadioButton, QButtonGroup, QGroupBox, QSpinBox
 )
-from PyQt5.QtCore import Qt, QSize, pyqtSignal, QObject
+from PyQt5.QtCore import Qt, QSize, pyqtSignal, QObject, QAbstractTableModel, QAbstractListModel, QSortFilterProxyModel, QModelIndex, QVariant, QTimer
 from PyQt5.QtGui import QIcon
-from functions import convert_excel, convert_json_to_csv, convert_csv_to_excel, fragment_file, merge_sheets
+from functions import merge_sheets, merge_columns, ConversionCancelled, read_file_sample, parse_derived_columns, preview_transform, RowTransform, ConversionJob, output_path_for, run_jobs, conversion_types_for, log_metrics, split_compression, SAMPLE_ROWS, MERGE_MEMORY_MB, PARQUET_COMPRESSIONS, ARROW_COMPRESSIONS, CSV_COMPRESSIONS, COMPRESSION_LEVEL_RANGES, DEFAULT_COMPRESSION_LEVELS
+from header_cache import HeaderCache
+from manifest import ConversionManifest
+from row_index import get_row_index
+from watcher import WatchProfile, save_profile
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+PREVIEW_PAGE_ROWS = SAMPLE_ROWS
+
 class WorkerSignals(QObject):
     progress = pyqtSignal(int, int)
-    complete = pyqtSignal()
+    rows = pyqtSignal(object)  # {'rows', 'rows_per_sec', 'eta'} over the whole batch
+    complete = pyqtSignal(int, int)  # skipped, failed
+
+class ConversionProgress:
+    # Rows and ETA over every running job, each file's progress weighted by its size
+    def __init__(self, jobs):
+        self.sizes = {}
+        for job in jobs:
+            try:
+                self.sizes[job.input_file] = os.path.getsize(job.input_file)
+            except OSError:
+                self.sizes[job.input_file] = 0
+        self.total = sum(self.sizes.values()) or 1
+        self.fractions = {}
+        self.rows = {}
+        self.started = time.perf_counter()
+
+    def update(self, event):
+        input_file = event['input_file']
+        self.rows[input_file] = event['rows']
+        self.fractions[input_file] = 1.0 if event['event'] == 'job' else event['fraction'] or 0.0
+        done = sum(self.sizes.get(name, 0) * fraction for name, fraction in self.fractions.items()) / self.total
+        elapsed = time.perf_counter() - self.started
+        rows = sum(self.rows.values())
+        return {
+            'rows': rows,
+            'rows_per_sec': rows / elapsed if elapsed > 0 else 0.0,
+            'eta': elapsed * (1 - done) / done if done > 0 else None,
+        }
 
 class WorkerThread(threading.Thread):
-    def __init__(self, file_configs, output_folder, fragment_size_mb, signals):
+    def __init__(self, jobs, max_workers, signals, manifest=None, cancel=None):
         super().__init__()
-        self.file_configs = file_configs
-        self.output_folder = output_folder
-        self.fragment_size_mb = fragment_size_mb
+        self.jobs = jobs
+        self.max_workers = max_workers
         self.signals = signals
+        self.manifest = manifest
+        self.cancel = cancel
 
     def run(self):
-        total_files = len(self.file_configs)
-        for i, (file_path, file_config) in enumerate(self.file_configs.items()):
-            conversion_type = file_config.type_combo.currentText()
-            selected_columns = file_config.get_selected_columns()
-            input_file = file_config.file_path
-            delimiter = file_config.get_delimiter()
-            string_delimiter = file_config.string_delimiter_line_edit.text()
-            excel_format = file_config.excel_format_combo.currentText()
-
-            file_name = os.path.basename(file_path)
-            output_extension = '.csv' if conversion_type in ['Excel to CSV', 'JSON to CSV'] else ('.xls' if excel_format == 'XLS' else '.xlsx')
-            output_file = os.path.join(self.output_folder, os.path.splitext(file_name)[0] + '_converted' + output_extension)
+        jobs, skipped = self.jobs, []
+        if self.manifest is not None:
+            jobs, skipped = self.manifest.partition(self.jobs)
+            self.signals.progress.emit(len(skipped), len(self.jobs))
 
-            try:
-                if conversion_type == 'Excel to CSV' and input_file.lower().endswith('.xlsx'):
-                    convert_excel(input_file, output_file, selected_columns)
-                elif conversion_type == 'CSV to Excel' and input_file.lower().endswith('.csv'):
-                    convert_csv_to_excel(input_file, output_file, selected_columns, delimiter, string_delimiter)
-                elif conversion_type == 'JSON to CSV' and input_file.lower().endswith('.json'):
-                    convert_json_to_csv(input_file, output_file, selected_columns)
+        def progress(done, total):
+            self.signals.progress.emit(len(skipped) + done, len(skipped) + total)
+
+        row_progress = ConversionProgress(jobs)
 
-                if self.fragment_size_mb:
-                    fragment_file(output_file, self.fragment_size_mb)
+        def metrics(event):
+            if event['event'] == 'job':
+                log_metrics(event)
+            self.signals.rows.emit(row_progress.update(event))
 
-            except Exception as e:
-                logging.error(f"Failed to convert {file_name}: {e}")
+        failed = run_jobs(jobs, self.max_workers, progress, self.manifest, metrics, self.cancel)
+        if self.manifest is not None:
+            self.manifest.save()
+        self.signals.complete.emit(len(skipped), len(failed))
 
-            self.signals.progress.emit(i + 1, total_files)
+class PreviewTableModel(QAbstractTableModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.columns = []
+        self.rows = []
+        self.first_row = 0  # Row number of the first row shown, when paging through a large file
+
+    def set_data(self, columns, rows, first_row=0):
+        self.beginResetModel()
+        self.columns = columns
+        self.rows = rows
+        self.first_row = first_row
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self.rows[index.row()][index.column()]
+        return QVariant()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return QVariant()
+        if orientation == Qt.Horizontal:
+            return self.columns[section]
+        return str(self.first_row + section + 1)
+
+class ColumnSelection:
+    # Plain column list plus one byte per column, readable without touching any Qt object
+    def __init__(self, columns=None):
+        self.columns = list(columns or [])
+        self.checked = bytearray(len(self.columns))
+
+    def selected(self):
+        return [column for column, checked in zip(self.columns, self.checked) if checked]
+
+class ColumnListModel(QAbstractListModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.selection = ColumnSelection()
+
+    def set_columns(self, columns):
+        self.set_selection(ColumnSelection(columns))
+
+    def set_selection(self, selection):
+        self.beginResetModel()
+        self.selection = selection
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.selection.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        if role == Qt.DisplayRole:
+            return self.selection.columns[index.row()]
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if self.selection.checked[index.row()] else Qt.Unchecked
+        return QVariant()
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.CheckStateRole or not index.isValid():
+            return False
+        self.selection.checked[index.row()] = 1 if value == Qt.Checked else 0
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        return True
+
+    def set_checked_rows(self, rows, checked):
+        # One dataChanged for the whole batch instead of one signal per column
+        rows = list(rows)
+        if not rows:
+            return
+        value = 1 if checked else 0
+        for row in rows:
+            self.selection.checked[row] = value
+        self.dataChanged.emit(self.index(min(rows)), self.index(max(rows)), [Qt.CheckStateRole])
+
+    def set_checked_where(self, predicate, checked=True):
+        self.set_checked_rows([row for row, column in enumerate(self.selection.columns) if predicate(column)], checked)
+
+class HeaderSignals(QObject):
+    loaded = pyqtSignal(int, str, object)
+    failed = pyqtSignal(int, str, str)
+    finished = pyqtSignal(int)
+
+class RowIndexSignals(QObject):
+    built = pyqtSignal(object, object)  # key, CsvRowIndex
+    failed = pyqtSignal(object, str)
+
+class RowIndexThread(threading.Thread):
+    # Scans one CSV for its row index, so the preview can page without blocking the GUI
+    def __init__(self, key, signals):
+        super().__init__(daemon=True)
+        self.key = key
+        self.signals = signals
 
-        self.signals.complete.emit()
+    def run(self):
+        file_path, quotechar, has_header = self.key
+        try:
+            self.signals.built.emit(self.key, get_row_index(file_path, quotechar, has_header))
+        except Exception as e:
+            self.signals.failed.emit(self.key, str(e))
+
+class MergeSignals(QObject):
+    complete = pyqtSignal(str, str)  # output file, error message ('' when it succeeded)
+    cancelled = pyqtSignal(str)
+
+class MergeThread(threading.Thread):
+    # Runs a merge off the GUI thread; a cancelled merge removes its partial output
+    def __init__(self, files, output_file, options, signals, cancel):
+        super().__init__(daemon=True)
+        self.files = files
+        self.output_file = output_file
+        self.options = options
+        self.signals = signals
+        self.cancel = cancel
+
+    def run(self):
+        try:
+            merge_sheets(self.files, self.output_file, cancel=self.cancel, **self.options)
+        except ConversionCancelled:
+            if os.path.exists(self.output_file):
+                os.remove(self.output_file)
+            self.signals.cancelled.emit(self.output_file)
+        except Exception as e:
+            self.signals.complete.emit(self.output_file, str(e))
+        else:
+            self.signals.complete.emit(self.output_file, '')
+
+class ColumnDiscoveryThread(threading.Thread):
+    def __init__(self, generation, files, loader, signals, max_workers=None):
+        super().__init__(daemon=True)
+        self.generation = generation
+        self.files = files
+        self.loader = loader
+        self.signals = signals
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = {executor.submit(self.loader, file_path, delimiter): file_path for file_path, delimiter in self.files}
+            for future in as_completed(futures):
+                if self.cancelled.is_set():
+                    break
+                file_path = futures[future]
+                try:
+                    self.signals.loaded.emit(self.generation, file_path, future.result())
+                except Exception as e:
+                    self.signals.failed.emit(self.generation, file_path, str(e))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if not self.cancelled.is_set():
+            self.signals.finished.emit(self.generation)
 
 class FileConfig(QWidget):
     def __init__(self, parent, file_path, file_name, close_callback):
@@ -67,9 +261,10 @@ class FileConfig(QWidget):
         self.file_name = file_name
         self.close_callback = close_callback
         self.parent = parent
-        self.all_columns = []  # Store all columns here for filtering
-        self.column_checkboxes = {}  # Store checkboxes for columns
-        self.original_order = []  # Store the original order of column names
+        self.dialect = None  # Sniffed CSV dialect, reused for preview and conversion
+        self.sheets = []  # Worksheet names of a workbook, in workbook order
+        self.sheet_selections = {}  # Column selection of every sheet visited so far
+        self.current_sheet = None  # None means the first sheet
         self.initUI()
 
     def initUI(self):
@@ -81,13 +276,7 @@ class FileConfig(QWidget):
         layout.addWidget(self.type_label)
 
         self.type_combo = QComboBox(self)
-        file_extension = os.path.splitext(self.file_name)[1].lower()
-        if file_extension == '.xlsx':
-            self.type_combo.addItems(['Excel to CSV'])
-        elif file_extension == '.csv':
-            self.type_combo.addItems(['CSV to Excel'])
-        elif file_extension == '.json':
-            self.type_combo.addItems(['JSON to CSV'])
+        self.type_combo.addItems(conversion_types_for(self.file_name))
         self.type_combo.currentIndexChanged.connect(self.update_ui_based_on_conversion_type)
         layout.addWidget(self.type_combo)
 
@@ -98,6 +287,19 @@ class FileConfig(QWidget):
         self.excel_format_combo.addItems(['XLS', 'XLSX'])
         layout.addWidget(self.excel_format_combo)
 
+        self.compression_label = QLabel('Compression:', self)
+        layout.addWidget(self.compression_label)
+
+        self.compression_combo = QComboBox(self)
+        self.compression_combo.currentIndexChanged.connect(self.update_compression_level)
+        layout.addWidget(self.compression_combo)
+
+        self.compression_level_label = QLabel('Compression Level:', self)
+        layout.addWidget(self.compression_level_label)
+
+        self.compression_level_spin = QSpinBox(self)
+        layout.addWidget(self.compression_level_spin)
+
         self.delimiter_group_box = QGroupBox('Delimiter (for CSV to Excel):', self)
         self.delimiter_group_box.setStyleSheet("""
             QGroupBox {
@@ -133,6 +335,25 @@ class FileConfig(QWidget):
         self.string_delimiter_line_edit.setText('"')
         layout.addWidget(self.string_delimiter_line_edit)
 
+        self.dialect_label = QLabel('', self)
+        layout.addWidget(self.dialect_label)
+
+        # Set from the sniffed dialect; unchecking it reads the first row as data
+        self.header_checkbox = QCheckBox('First row is a header', self)
+        self.header_checkbox.setChecked(True)
+        self.header_checkbox.stateChanged.connect(self.toggle_header)
+        layout.addWidget(self.header_checkbox)
+
+        self.sheets_label = QLabel('Sheets to export (select one to edit its columns):', self)
+        layout.addWidget(self.sheets_label)
+
+        self.sheet_list = QListWidget(self)
+        self.sheet_list.setMaximumHeight(120)
+        self.sheet_list.currentRowChanged.connect(self.switch_sheet)
+        layout.addWidget(self.sheet_list)
+        self.sheets_label.hide()
+        self.sheet_list.hide()
+
         self.columns_label = QLabel('Select Columns:', self)
         layout.addWidget(self.columns_label)
 
@@ -145,12 +366,42 @@ class FileConfig(QWidget):
         self.select_all_checkbox.stateChanged.connect(self.toggle_select_all)
         layout.addWidget(self.select_all_checkbox)
 
-        self.scroll_area = QScrollArea(self)
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_content = QWidget(self.scroll_area)
-        self.scroll_layout = QFormLayout(self.scroll_content)
-        self.scroll_area.setWidget(self.scroll_content)
-        layout.addWidget(self.scroll_area)
+        self.column_model = ColumnListModel(self)
+        self.column_model.dataChanged.connect(lambda *args: self.parent.update_table_preview())
+        self.column_proxy = QSortFilterProxyModel(self)
+        self.column_proxy.setSourceModel(self.column_model)
+        self.column_proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        self.column_view = QListView(self)
+        self.column_view.setModel(self.column_proxy)
+        self.column_view.setUniformItemSizes(True)
+        layout.addWidget(self.column_view)
+
+        self.row_filter_label = QLabel("Row Filter (e.g. status == 'ACTIVE' and amount > 0):", self)
+        layout.addWidget(self.row_filter_label)
+
+        self.row_filter_line_edit = QLineEdit(self)
+        self.row_filter_line_edit.setPlaceholderText('Keep every row')
+        self.row_filter_line_edit.textChanged.connect(lambda *args: self.parent.update_table_preview())
+        layout.addWidget(self.row_filter_line_edit)
+
+        self.derived_columns_label = QLabel('Derived Columns (name = expression; ...):', self)
+        layout.addWidget(self.derived_columns_label)
+
+        self.derived_columns_line_edit = QLineEdit(self)
+        self.derived_columns_line_edit.setPlaceholderText('total = price * quantity; code = name.str.upper()')
+        self.derived_columns_line_edit.textChanged.connect(lambda *args: self.parent.update_table_preview())
+        layout.addWidget(self.derived_columns_line_edit)
+
+        self.preview_transform_checkbox = QCheckBox('Apply filter and derived columns to the preview', self)
+        self.preview_transform_checkbox.setChecked(True)
+        self.preview_transform_checkbox.stateChanged.connect(lambda *args: self.parent.update_table_preview())
+        layout.addWidget(self.preview_transform_checkbox)
+
+        self.transform_error_label = QLabel('', self)
+        self.transform_error_label.setWordWrap(True)
+        self.transform_error_label.setStyleSheet('color: #FF6B6B;')
+        self.transform_error_label.hide()
+        layout.addWidget(self.transform_error_label)
 
         self.copy_selection_button = QPushButton('Copy Selection To', self)
         self.copy_selection_button.clicked.connect(self.copy_selection_to)
@@ -163,7 +414,7 @@ class FileConfig(QWidget):
             QCheckBox {
                 color: #FFFFFF;
             }
-            QLineEdit, QComboBox, QScrollArea, QPushButton {
+            QLineEdit, QComboBox, QListView, QListWidget, QPushButton {
                 background-color: #3E3E3E;
                 color: #FFFFFF;
                 border: 1px solid #5A5A5A;
@@ -180,103 +431,242 @@ class FileConfig(QWidget):
 
     def update_ui_based_on_conversion_type(self):
         conversion_type = self.type_combo.currentText()
-        if conversion_type == 'CSV to Excel':
-            self.excel_format_label.show()
-            self.excel_format_combo.show()
-            self.delimiter_group_box.show()
-            self.string_delimiter_label.show()
-            self.string_delimiter_line_edit.show()
-        else:
-            self.excel_format_label.hide()
-            self.excel_format_combo.hide()
-            self.delimiter_group_box.hide()
-            self.string_delimiter_label.hide()
-            self.string_delimiter_line_edit.hide()
+        source, _, target = conversion_type.partition(' to ')
+        for widget in (self.delimiter_group_box, self.string_delimiter_label, self.string_delimiter_line_edit, self.dialect_label, self.header_checkbox):
+            widget.setVisible(source == 'CSV')
+        for widget in (self.excel_format_label, self.excel_format_combo):
+            widget.setVisible(target == 'Excel')
+
+        compressions = {'Parquet': PARQUET_COMPRESSIONS, 'Arrow': ARROW_COMPRESSIONS, 'CSV': CSV_COMPRESSIONS}.get(target, [])
+        self.compression_combo.clear()
+        self.compression_combo.addItems(compressions)
+        self.compression_label.setVisible(bool(compressions))
+        self.compression_combo.setVisible(bool(compressions))
+        self.update_compression_level()
+
+    def update_compression_level(self):
+        # Levels only apply to the stream codecs of CSV outputs
+        codec = self.compression_combo.currentText()
+        visible = self.type_combo.currentText().endswith(' to CSV') and codec in COMPRESSION_LEVEL_RANGES
+        self.compression_level_label.setVisible(visible)
+        self.compression_level_spin.setVisible(visible)
+        if visible:
+            self.compression_level_spin.setRange(*COMPRESSION_LEVEL_RANGES[codec])
+            self.compression_level_spin.setValue(DEFAULT_COMPRESSION_LEVELS[codec])
+
+    def get_compression_level(self):
+        # Not isVisible(): tabs in the background are never visible
+        return None if self.compression_level_spin.isHidden() else self.compression_level_spin.value()
 
     def get_delimiter(self):
         return self.delimiter_group.checkedButton().text()
 
+    def set_loading(self, loading):
+        self.columns_label.setText('Select Columns (loading...):' if loading else 'Select Columns:')
+        self.search_bar.setEnabled(not loading)
+        self.select_all_checkbox.setEnabled(not loading)
+        self.copy_selection_button.setEnabled(not loading)
+
+    def apply_dialect(self, dialect):
+        self.dialect = dialect
+        for button in self.delimiter_group.buttons():
+            if button.text() == dialect['delimiter']:
+                button.setChecked(True)
+                break
+        self.string_delimiter_line_edit.setText(dialect['quotechar'])
+        self.header_checkbox.blockSignals(True)
+        self.header_checkbox.setChecked(dialect['has_header'])
+        self.header_checkbox.blockSignals(False)
+        self.dialect_label.setText(f"Detected encoding: {dialect['encoding']}")
+
+    def has_header(self):
+        return self.header_checkbox.isChecked()
+
+    def toggle_header(self):
+        self.update_columns_based_on_delimiter()
+        self.parent.update_table_preview()
+
+    def set_sheets(self, sheets):
+        self.sheets = sheets
+        self.sheet_selections.clear()
+        self.sheet_list.blockSignals(True)
+        self.sheet_list.clear()
+        for index, sheet_name in enumerate(sheets):
+            item = QListWidgetItem(sheet_name, self.sheet_list)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked if index == 0 else Qt.Unchecked)
+        self.sheet_list.setCurrentRow(0)
+        self.sheet_list.blockSignals(False)
+        self.sheets_label.setVisible(len(sheets) > 1)
+        self.sheet_list.setVisible(len(sheets) > 1)
+
+    def switch_sheet(self, row):
+        if row < 0:
+            return
+        previous = self.current_sheet or self.sheets[0]
+        self.sheet_selections[previous] = self.column_model.selection
+        sheet_name = self.sheets[row]
+        self.current_sheet = sheet_name if row > 0 else None
+        if sheet_name in self.sheet_selections:
+            self.column_model.set_selection(self.sheet_selections[sheet_name])
+        else:
+            self.update_columns(self.parent.detect_columns(self.file_path, sheet_name=self.current_sheet))
+        self.parent.update_table_preview()
+
+    def get_sheet_columns(self):
+        checked = [self.sheet_list.item(row).text() for row in range(self.sheet_list.count()) if self.sheet_list.item(row).checkState() == Qt.Checked]
+        if not self.sheets or checked == self.sheets[:1]:
+            return None
+        selections = dict(self.sheet_selections)
+        selections[self.current_sheet or self.sheets[0]] = self.column_model.selection
+        # Sheets that were never opened are exported with all their columns
+        return {sheet_name: selections[sheet_name].selected() if sheet_name in selections else None for sheet_name in checked}
+
     def update_columns_based_on_delimiter(self):
         delimiter = self.get_delimiter()
-        columns = self.parent.detect_columns(self.file_path, delimiter)
+        columns = self.parent.detect_columns(self.file_path, delimiter, self.string_delimiter_line_edit.text() or '"', has_header=self.has_header())
         self.update_columns(columns)
 
     def filter_columns(self):
-        search_text = self.search_bar.text().lower()
-        if search_text == '':
-            for column in self.original_order:
-                self.column_checkboxes[column].setParent(None)
-                self.scroll_layout.addRow(self.column_checkboxes[column])
-                self.column_checkboxes[column].show()
-        else:
-            for column, checkbox in self.column_checkboxes.items():
-                checkbox.setParent(None)
-                if search_text in column.lower():
-                    self.scroll_layout.addRow(checkbox)
-                    checkbox.show()
-                else:
-                    checkbox.hide()
+        self.column_proxy.setFilterFixedString(self.search_bar.text())
+
+    def visible_rows(self):
+        if not self.search_bar.text():
+            return range(self.column_model.rowCount())
+        return [self.column_proxy.mapToSource(self.column_proxy.index(row, 0)).row() for row in range(self.column_proxy.rowCount())]
 
     def toggle_select_all(self):
-        select_all = self.select_all_checkbox.isChecked()
-        for checkbox in self.column_checkboxes.values():
-            if checkbox.isVisible():
-                checkbox.setChecked(select_all)
-        self.parent.update_table_preview()
+        self.column_model.set_checked_rows(self.visible_rows(), self.select_all_checkbox.isChecked())
 
     def update_columns(self, columns):
-        self.clear_columns()
-        self.all_columns = columns
-        self.original_order = columns[:]
-        for column in columns:
-            checkbox = QCheckBox(column, self)
-            checkbox.stateChanged.connect(lambda state, c=column: self.parent.update_table_preview())
-            self.column_checkboxes[column] = checkbox
-            self.scroll_layout.addRow(checkbox)
+        self.column_model.set_columns(columns)
 
     def clear_columns(self):
-        for i in reversed(range(self.scroll_layout.count())):
-            widget = self.scroll_layout.itemAt(i).widget()
-            if widget is not None:
-                widget.setParent(None)
+        self.column_model.set_columns([])
 
     def get_selected_columns(self):
-        return [column for column, checkbox in self.column_checkboxes.items() if checkbox.isChecked()]
+        return self.column_model.selection.selected()
+
+    def check_columns(self, predicate):
+        self.column_model.set_checked_where(predicate)
+
+    def to_job(self, output_folder, fragment_size_mb=None, fragment_rows=None):
+        conversion_type = self.type_combo.currentText()
+        return ConversionJob(
+            input_file=self.file_path,
+            output_file=output_path_for(self.file_path, output_folder, conversion_type, self.excel_format_combo.currentText(), self.compression_combo.currentText()),
+            conversion_type=conversion_type,
+            selected_columns=self.get_selected_columns(),
+            delimiter=self.get_delimiter(),
+            string_delimiter=self.string_delimiter_line_edit.text(),
+            encoding=self.dialect['encoding'] if self.dialect else None,
+            compression=self.compression_combo.currentText() or None,
+            compression_level=self.get_compression_level(),
+            sheet_columns=self.get_sheet_columns(),
+            has_header=self.has_header(),
+            fragment_size_mb=fragment_size_mb,
+            fragment_rows=fragment_rows,
+            row_filter=self.row_filter_line_edit.text().strip() or None,
+            derived_columns=parse_derived_columns(self.derived_columns_line_edit.text()) or None,
+        )
 
     def close_tab(self):
         self.close_callback(self.file_name)
 
+    def get_transform(self):
+        # RowTransform of the filter and derived columns typed in, None when both are empty;
+        # raises ValueError for a malformed derived column
+        derived = parse_derived_columns(self.derived_columns_line_edit.text())
+        row_filter = self.row_filter_line_edit.text().strip()
+        return RowTransform(row_filter, derived) if row_filter or derived else None
+
+    def show_transform_error(self, error=None):
+        self.transform_error_label.setText(f'Filter or derived columns not applied: {error}' if error else '')
+        self.transform_error_label.setVisible(bool(error))
+
     def copy_selection_to(self):
         selected_columns = self.get_selected_columns()
         delimiter = self.get_delimiter()
         string_delimiter = self.string_delimiter_line_edit.text()
         excel_format = self.excel_format_combo.currentText()
+        row_filter = self.row_filter_line_edit.text()
+        derived_columns = self.derived_columns_line_edit.text()
         dialog = CopySelectionDialog(self.parent, selected_columns, delimiter, string_delimiter, excel_format)
         if dialog.exec_() == QDialog.Accepted:
             target_sheets = dialog.get_selected_sheets()
             for sheet_name in target_sheets:
                 if sheet_name in self.parent.file_configs:
-                    self.parent.file_configs[sheet_name].set_general_settings(delimiter, string_delimiter, excel_format)
+                    self.parent.file_configs[sheet_name].set_general_settings(delimiter, string_delimiter, excel_format, row_filter, derived_columns)
             # Second step: copy column selections
             for sheet_name in target_sheets:
                 if sheet_name in self.parent.file_configs:
                     self.parent.file_configs[sheet_name].set_columns(selected_columns)
         self.parent.update_table_preview()
 
-    def set_general_settings(self, delimiter, string_delimiter, excel_format):
+    def set_general_settings(self, delimiter, string_delimiter, excel_format, row_filter='', derived_columns=''):
         for button in self.delimiter_group.buttons():
             if button.text() == delimiter:
                 button.setChecked(True)
                 break
         self.string_delimiter_line_edit.setText(string_delimiter)
         self.excel_format_combo.setCurrentText(excel_format)
+        self.row_filter_line_edit.setText(row_filter)
+        self.derived_columns_line_edit.setText(derived_columns)
         self.update_columns_based_on_delimiter()
 
     def set_columns(self, selected_columns):
-        for column, checkbox in self.column_checkboxes.items():
-            checkbox.setChecked(column in selected_columns)
+        selected_columns = set(selected_columns)
+        self.column_model.set_checked_where(lambda column: column not in selected_columns, False)
+        self.column_model.set_checked_where(lambda column: column in selected_columns)
         self.parent.update_table_preview()
 
+class MergeOptionsDialog(QDialog):
+    # Optional ordering and deduplication of a merge, by columns of the merged files
+    def __init__(self, parent, columns):
+        super().__init__(parent)
+        self.setWindowTitle('Merge Options')
+        self.setWindowIcon(QIcon('conversor.ico'))
+        self.columns = columns
+        self.initUI()
+
+    def initUI(self):
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        self.columns_label = QLabel(f"Columns: {', '.join(self.columns)}", self)
+        self.columns_label.setWordWrap(True)
+        layout.addWidget(self.columns_label)
+
+        layout.addWidget(QLabel('Sort by (comma-separated columns; empty keeps file order, or orders by the duplicate columns below when those are set):', self))
+        self.sort_keys_line_edit = QLineEdit(self)
+        layout.addWidget(self.sort_keys_line_edit)
+
+        layout.addWidget(QLabel('Drop duplicate rows of (comma-separated columns, empty keeps all):', self))
+        self.dedupe_keys_line_edit = QLineEdit(self)
+        layout.addWidget(self.dedupe_keys_line_edit)
+
+        layout.addWidget(QLabel('Memory for sorting (MB):', self))
+        self.memory_spin_box = QSpinBox(self)
+        self.memory_spin_box.setRange(16, 1024 * 1024)
+        self.memory_spin_box.setValue(MERGE_MEMORY_MB)
+        layout.addWidget(self.memory_spin_box)
+
+        self.button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        self.button_box.accepted.connect(self.accept)
+        self.button_box.rejected.connect(self.reject)
+        layout.addWidget(self.button_box)
+
+    @staticmethod
+    def _keys(line_edit):
+        return [column.strip() for column in line_edit.text().split(',') if column.strip()]
+
+    def get_options(self):
+        return {
+            'sort_keys': self._keys(self.sort_keys_line_edit),
+            'dedupe_keys': self._keys(self.dedupe_keys_line_edit),
+            'memory_mb': self.memory_spin_box.value(),
+        }
+
 class CopySelectionDialog(QDialog):
     def __init__(self, parent, selected_columns, delimiter, string_delimiter, excel_format):
         super().__init__(parent)
@@ -330,6 +720,18 @@ class ConverterApp(QWidget):
         super().__init__()
         self.file_configs = {}
         self.current_file = None
+        self.header_cache = HeaderCache()
+        self.load_generation = 0
+        self.discovery_thread = None
+        self.header_signals = HeaderSignals()
+        self.header_signals.loaded.connect(self.on_columns_loaded)
+        self.header_signals.failed.connect(self.on_columns_failed)
+        self.header_signals.finished.connect(self.on_columns_finished)
+        self.row_indexes = {}  # (path, quotechar, has_header) -> CsvRowIndex, None while it is built
+        self.preview_row = 0  # First data row shown in the preview
+        self.row_index_signals = RowIndexSignals()
+        self.row_index_signals.built.connect(self.on_row_index_built)
+        self.row_index_signals.failed.connect(self.on_row_index_failed)
         self.initUI()
 
     def initUI(self):
@@ -346,7 +748,7 @@ class ConverterApp(QWidget):
                 margin-bottom: 5px;
                 color: #FFFFFF;
             }
-            QLineEdit {
+            QLineEdit, QSpinBox {
                 font-size: 14px;
                 padding: 5px;
                 background-color: #3E3E3E;
@@ -376,7 +778,7 @@ class ConverterApp(QWidget):
             QPushButton:pressed {
                 background-color: #388E3C;
             }
-            QTableWidget {
+            QTableView {
                 background-color: #3E3E3E;
                 color: #FFFFFF;
                 border: 1px solid #5A5A5A;
@@ -455,13 +857,33 @@ class ConverterApp(QWidget):
         self.fragment_checkbox.stateChanged.connect(self.toggle_fragmentation)
         left_layout.addWidget(self.fragment_checkbox)
 
-        self.fragment_size_label = QLabel('Fragment Size (MB):', self)
+        self.fragment_size_label = QLabel('Fragment Size:', self)
         left_layout.addWidget(self.fragment_size_label)
 
+        fragment_size_layout = QHBoxLayout()
         self.fragment_size_line_edit = QLineEdit(self)
-        self.fragment_size_line_edit.setPlaceholderText('Enter fragment size in MB')
+        self.fragment_size_line_edit.setPlaceholderText('Enter fragment size')
         self.fragment_size_line_edit.setEnabled(False)
-        left_layout.addWidget(self.fragment_size_line_edit)
+        fragment_size_layout.addWidget(self.fragment_size_line_edit)
+
+        self.fragment_unit_combo = QComboBox(self)
+        self.fragment_unit_combo.addItems(['MB', 'Rows'])
+        self.fragment_unit_combo.setEnabled(False)
+        fragment_size_layout.addWidget(self.fragment_unit_combo)
+        left_layout.addLayout(fragment_size_layout)
+
+        self.workers_label = QLabel('Parallel Workers:', self)
+        left_layout.addWidget(self.workers_label)
+
+        self.workers_spin_box = QSpinBox(self)
+        self.workers_spin_box.setRange(1, os.cpu_count() or 1)
+        self.workers_spin_box.setValue(os.cpu_count() or 1)
+        left_layout.addWidget(self.workers_spin_box)
+
+        self.skip_unchanged_checkbox = QCheckBox('Skip unchanged files', self)
+        self.skip_unchanged_checkbox.setToolTip('Inputs whose content and settings match the last conversion into this output folder are not converted again')
+        self.skip_unchanged_checkbox.setChecked(True)
+        left_layout.addWidget(self.skip_unchanged_checkbox)
 
         self.example_checkbox = QCheckBox('Example sheet', self)
         self.example_checkbox.stateChanged.connect(self.toggle_example_sheet)
@@ -478,7 +900,7 @@ class ConverterApp(QWidget):
         left_layout.addWidget(self.example_file_button)
 
         self.tab_widget = QTabWidget(self)
-        self.tab_widget.currentChanged.connect(self.update_table_preview)
+        self.tab_widget.currentChanged.connect(self.reset_preview_page)
         left_layout.addWidget(self.tab_widget)
 
         self.convert_button = QPushButton('Convert', self)
@@ -489,8 +911,45 @@ class ConverterApp(QWidget):
         self.merge_button.clicked.connect(self.merge_sheets)
         left_layout.addWidget(self.merge_button)
 
-        self.table_widget = QTableWidget(self)
-        main_layout.addWidget(self.table_widget)
+        self.watch_profile_button = QPushButton('Save Watch Profile', self)
+        self.watch_profile_button.setToolTip('Convert files landing in the input folder like the current tab with: python -m conversor <input> <output> --watch')
+        self.watch_profile_button.clicked.connect(self.save_watch_profile)
+        left_layout.addWidget(self.watch_profile_button)
+
+        self.preview_model = PreviewTableModel(self)
+        self.table_view = QTableView(self)
+        self.table_view.setModel(self.preview_model)
+        preview_layout = QVBoxLayout()
+        preview_layout.addWidget(self.table_view)
+        main_layout.addLayout(preview_layout)
+
+        page_layout = QHBoxLayout()
+        self.previous_page_button = QPushButton('Previous', self)
+        self.previous_page_button.clicked.connect(lambda: self.go_to_preview_row(self.preview_row - PREVIEW_PAGE_ROWS))
+        page_layout.addWidget(self.previous_page_button)
+
+        self.next_page_button = QPushButton('Next', self)
+        self.next_page_button.clicked.connect(lambda: self.go_to_preview_row(self.preview_row + PREVIEW_PAGE_ROWS))
+        page_layout.addWidget(self.next_page_button)
+
+        page_layout.addWidget(QLabel('Go to row:', self))
+        self.go_to_row_spin_box = QSpinBox(self)
+        self.go_to_row_spin_box.setRange(1, 2 ** 31 - 1)
+        self.go_to_row_spin_box.setKeyboardTracking(False)
+        self.go_to_row_spin_box.valueChanged.connect(lambda value: self.go_to_preview_row(value - 1))
+        page_layout.addWidget(self.go_to_row_spin_box)
+
+        self.page_label = QLabel('', self)
+        page_layout.addWidget(self.page_label)
+        page_layout.addStretch()
+        preview_layout.addLayout(page_layout)
+        self.update_page_controls()
+
+        # Bursts of checkbox toggles collapse into a single preview refresh
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(150)
+        self.preview_timer.timeout.connect(self.refresh_table_preview)
 
     def resize_to_screen(self):
         screen_geometry = QApplication.desktop().screenGeometry()
@@ -499,6 +958,7 @@ class ConverterApp(QWidget):
 
     def toggle_fragmentation(self):
         self.fragment_size_line_edit.setEnabled(self.fragment_checkbox.isChecked())
+        self.fragment_unit_combo.setEnabled(self.fragment_checkbox.isChecked())
 
     def browse_input_folder(self):
         options = QFileDialog.Options()
@@ -535,23 +995,56 @@ class ConverterApp(QWidget):
 
             columns = [col.strip() for col in df.columns]  # Trimming column headers
             for file_config in self.file_configs.values():
-                for column, checkbox in file_config.column_checkboxes.items():
-                    if column.strip() in columns:
-                        checkbox.setChecked(True)
+                file_config.check_columns(lambda column: column.strip() in columns)
 
             self.update_table_preview()
         except Exception as e:
             QMessageBox.critical(self, 'Error', f'Failed to process example sheet: {e}')
 
     def update_file_tabs(self, folder_path):
+        # Abandon a folder that is still loading, its late results are ignored by generation
+        if self.discovery_thread is not None:
+            self.discovery_thread.cancel()
+        self.load_generation += 1
+
         self.tab_widget.clear()
         self.file_configs.clear()
         self.current_folder = folder_path
 
+        pending = []
         for file_name in os.listdir(folder_path):
             file_path = os.path.normpath(os.path.join(folder_path, file_name))
-            if os.path.isfile(file_path) and file_name.lower().endswith(('.xlsx', '.csv', '.json')):
-                self.add_file_tab(file_path, file_name)
+            if os.path.isfile(file_path) and conversion_types_for(file_name):
+                file_config = self.add_file_tab(file_path, file_name, discover=False)
+                file_config.set_loading(True)
+                # No delimiter: CSV files get their dialect sniffed along with the header
+                pending.append((file_path, None))
+
+        self.discovery_thread = ColumnDiscoveryThread(self.load_generation, pending, self.read_sample, self.header_signals)
+        self.discovery_thread.start()
+
+    def on_columns_loaded(self, generation, file_path, sample):
+        file_config = self.file_configs.get(file_path)
+        if generation != self.load_generation or file_config is None:
+            return
+        if 'dialect' in sample:
+            file_config.apply_dialect(sample['dialect'])
+        if 'sheets' in sample:
+            file_config.set_sheets(sample['sheets'])
+        file_config.update_columns(sample['columns'])
+        file_config.set_loading(False)
+
+    def on_columns_failed(self, generation, file_path, error):
+        file_config = self.file_configs.get(file_path)
+        if generation != self.load_generation or file_config is None:
+            return
+        logging.error(f"Failed to detect columns for {file_path}: {error}")
+        file_config.update_columns([])
+        file_config.set_loading(False)
+
+    def on_columns_finished(self, generation):
+        if generation == self.load_generation:
+            self.header_cache.save()
 
     def add_closable_tab(self, widget, title):
         tab_index = self.tab_widget.addTab(widget, title)
@@ -574,47 +1067,42 @@ class ConverterApp(QWidget):
         self.tab_widget.tabBar().setTabButton(tab_index, QTabBar.RightSide, tab_button)
         self.tab_widget.setCurrentIndex(tab_index)
 
-    def add_file_tab(self, file_path, file_name):
+    def add_file_tab(self, file_path, file_name, discover=True):
         file_path = os.path.normpath(file_path)
         file_config = FileConfig(self, file_path, file_name, self.remove_file_tab)
         self.file_configs[file_path] = file_config
 
         self.add_closable_tab(file_config, file_name)
 
-        if file_name.lower().endswith('.xlsx'):
-            df = pd.read_excel(file_path, nrows=1)
-            file_config.update_columns(df.columns.tolist())
-        elif file_name.lower().endswith('.csv'):
-            delimiter = file_config.get_delimiter()
-            columns = self.detect_columns(file_path, delimiter)
-            file_config.update_columns(columns)
-        elif file_name.lower().endswith('.json'):
-            data = []
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for i, line in enumerate(f):
-                    if i >= 10:
-                        break
-                    data.append(json.loads(line.strip()))
-            df = pd.json_normalize(data)
-            file_config.update_columns(df.columns.tolist())
-
-    def detect_columns(self, file_path, delimiter=None):
+        if discover:
+            file_config.update_columns(self.detect_columns(file_path, file_config.get_delimiter()))
+        return file_config
+
+    def read_sample(self, file_path, delimiter=None, quotechar='"', sheet_name=None, has_header=None):
+        if sheet_name is not None:
+            def load_sheet(path, delimiter, quotechar):
+                return read_file_sample(path, sheet_name=sheet_name)
+            return self.header_cache.get_or_load(file_path, None, None, load_sheet, sheet_name)
+
+        # Only CSV samples depend on the delimiter and quotechar, other formats share one cache entry
+        if not split_compression(file_path)[0].lower().endswith('.csv'):
+            return self.header_cache.get_or_load(file_path, None, None, read_file_sample)
+
+        sniffed = self.header_cache.get_or_load(file_path, None, None, read_file_sample)
+        dialect = sniffed['dialect']
+        if has_header is not None and has_header != dialect['has_header']:
+            # Overriding the sniffed header is rare and the sample is small, so it is read again, not cached
+            return read_file_sample(file_path, delimiter or dialect['delimiter'], quotechar, encoding=dialect['encoding'], has_header=has_header)
+        if delimiter is None or (delimiter == dialect['delimiter'] and quotechar == dialect['quotechar']):
+            return sniffed
+
+        def load(path, delimiter, quotechar):
+            return read_file_sample(path, delimiter, quotechar, encoding=dialect['encoding'], has_header=dialect['has_header'])
+        return self.header_cache.get_or_load(file_path, delimiter, quotechar, load)
+
+    def detect_columns(self, file_path, delimiter=None, quotechar='"', sheet_name=None, has_header=None):
         try:
-            if file_path.endswith('.csv'):
-                df = pd.read_csv(file_path, delimiter=delimiter, nrows=1)
-            elif file_path.endswith('.xlsx'):
-                df = pd.read_excel(file_path, nrows=1)
-            elif file_path.endswith('.json'):
-                data = []
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    for i, line in enumerate(f):
-                        if i >= 10:
-                            break
-                        data.append(json.loads(line.strip()))
-                df = pd.json_normalize(data)
-            else:
-                return []
-            return df.columns.tolist()
+            return self.read_sample(file_path, delimiter, quotechar, sheet_name, has_header)['columns']
         except Exception as e:
             logging.error(f"Failed to detect columns with delimiter '{delimiter}': {e}")
             return []
@@ -629,97 +1117,240 @@ class ConverterApp(QWidget):
                 break
 
     def update_table_preview(self):
-        current_index = self.tab_widget.currentIndex()
-        if current_index == -1:
+        self.preview_timer.start()
+
+    def reset_preview_page(self):
+        self.preview_row = 0
+        self.update_table_preview()
+
+    def row_index_key(self, file_config):
+        # Only uncompressed CSV can be indexed; other files preview their first rows only
+        if file_config is None or not file_config.file_path.lower().endswith('.csv'):
+            return None
+        if file_config.dialect and (file_config.dialect['encoding'] or '').lower().startswith('utf-16'):
+            return None
+        quotechar = file_config.string_delimiter_line_edit.text() or '"'
+        return (file_config.file_path, quotechar, file_config.has_header())
+
+    def current_row_index(self, file_config):
+        key = self.row_index_key(file_config)
+        index = self.row_indexes.get(key) if key is not None else None
+        if index is not None and not index.is_current():
+            del self.row_indexes[key]
+            return None
+        return index
+
+    def go_to_preview_row(self, row):
+        file_config = self.tab_widget.currentWidget()
+        key = self.row_index_key(file_config)
+        if key is None:
             return
-        file_path = list(self.file_configs.keys())[current_index]
-        selected_columns = [self.file_configs[file_path].scroll_layout.itemAt(i).widget().text()
-                            for i in range(self.file_configs[file_path].scroll_layout.count())
-                            if self.file_configs[file_path].scroll_layout.itemAt(i).widget().isChecked()]
-        delimiter = self.file_configs[file_path].get_delimiter()
-        string_delimiter = self.file_configs[file_path].string_delimiter_line_edit.text() or None
+        self.preview_row = max(row, 0)
+        index = self.current_row_index(file_config)
+        if index is not None:
+            self.preview_row = min(self.preview_row, max(index.rows - 1, 0))
+            self.update_table_preview()
+        elif key not in self.row_indexes:
+            # First jump into this file: index it in the background, the preview follows when done
+            self.row_indexes[key] = None
+            self.page_label.setText('Indexing rows...')
+            RowIndexThread(key, self.row_index_signals).start()
+
+    def on_row_index_built(self, key, index):
+        self.row_indexes[key] = index
+        if key == self.row_index_key(self.tab_widget.currentWidget()):
+            self.preview_row = min(self.preview_row, max(index.rows - 1, 0))
+            self.update_table_preview()
 
+    def on_row_index_failed(self, key, error):
+        self.row_indexes.pop(key, None)
+        self.page_label.setText('')
+        QMessageBox.critical(self, 'Error', f'Failed to index rows of {key[0]}: {error}')
+
+    def update_page_controls(self, index=None, shown=0):
+        key = self.row_index_key(self.tab_widget.currentWidget())
+        for widget in (self.previous_page_button, self.next_page_button, self.go_to_row_spin_box):
+            widget.setEnabled(key is not None)
+        self.go_to_row_spin_box.blockSignals(True)
+        self.go_to_row_spin_box.setValue(self.preview_row + 1)
+        self.go_to_row_spin_box.blockSignals(False)
+        if index is not None:
+            last = self.preview_row + shown
+            self.page_label.setText(f'Rows {self.preview_row + 1:,}-{last:,} of {index.rows:,}')
+        elif key is None or key not in self.row_indexes:
+            self.page_label.setText('')
+
+    def refresh_table_preview(self):
+        file_config = self.tab_widget.currentWidget()
+        selected_columns = file_config.get_selected_columns() if file_config is not None else []
         if not selected_columns:
-            self.table_widget.clear()
-            self.table_widget.setRowCount(0)
-            self.table_widget.setColumnCount(0)
+            self.preview_model.set_data([], [])
+            self.update_page_controls()
             return
 
         try:
-            if file_path.endswith('.csv'):
-                df = pd.read_csv(file_path, delimiter=delimiter, usecols=selected_columns, nrows=10, quotechar=string_delimiter)
-            elif file_path.endswith('.xlsx'):
-                df = pd.read_excel(file_path, usecols=selected_columns, nrows=10)
-            elif file_path.endswith('.json'):
-                data = []
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    for i, line in enumerate(f):
-                        if i >= 10:
-                            break
-                        data.append(json.loads(line.strip()))
-                df = pd.json_normalize(data)
-                df = df[selected_columns]
-
-            self.table_widget.setColumnCount(len(df.columns))
-            self.table_widget.setRowCount(len(df.index))
-            self.table_widget.setHorizontalHeaderLabels(df.columns)
-
-            for row_index, row_data in df.iterrows():
-                for col_index, value in enumerate(row_data):
-                    self.table_widget.setItem(row_index, col_index, QTableWidgetItem(str(value)))
+            # The sample is read once per file and dialect, projecting the selection happens in memory
+            sample = self.read_sample(file_config.file_path, file_config.get_delimiter(), file_config.string_delimiter_line_edit.text() or '"', file_config.current_sheet, file_config.has_header())
+            width = len(sample['columns'])
+            row_index = self.current_row_index(file_config)
+            if row_index is not None:
+                # Seek to the nearest indexed row and parse only the page that is shown
+                encoding = file_config.dialect['encoding'] if file_config.dialect else None
+                page = row_index.read_rows(self.preview_row, PREVIEW_PAGE_ROWS, file_config.get_delimiter(), encoding)
+                page = [(row + [''] * width)[:width] for row in page]
+            else:
+                self.preview_row = 0
+                page = sample['rows']
+
+            columns = rows = None
+            file_config.show_transform_error()
+            if file_config.preview_transform_checkbox.isChecked():
+                try:
+                    transform = file_config.get_transform()
+                    if transform is not None:
+                        columns, rows = preview_transform(sample['columns'], page, transform, selected_columns)
+                except Exception as e:
+                    # Half-typed expressions are common, show why instead of interrupting
+                    file_config.show_transform_error(e)
+            if columns is None:
+                selected = set(selected_columns)
+                indices = [index for index, column in enumerate(sample['columns']) if column in selected]
+                columns = [sample['columns'][index] for index in indices]
+                rows = [[row[index] for index in indices] for row in page]
+            self.preview_model.set_data(columns, rows, self.preview_row)
+            self.update_page_controls(row_index, len(page))
         except Exception as e:
             QMessageBox.critical(self, 'Error', f'Failed to update table preview: {e}')
 
+    def get_fragment_settings(self):
+        # (fragment_size_mb, fragment_rows); raises ValueError for an invalid fragment size
+        if not self.fragment_checkbox.isChecked():
+            return None, None
+        fragment_size = self.fragment_size_line_edit.text()
+        if self.fragment_unit_combo.currentText() == 'Rows':
+            return None, int(fragment_size)
+        return float(fragment_size), None
+
     def convert_files(self):
         output_folder = self.output_line_edit.text()
-        fragment_size = self.fragment_size_line_edit.text()
-        
+
         # Validation for fragment size input
-        if self.fragment_checkbox.isChecked():
-            try:
-                fragment_size_mb = float(fragment_size)
-            except ValueError:
-                QMessageBox.warning(self, "Fragment Size Error", "Please enter a valid number for the fragment size.")
-                return
-        else:
-            fragment_size_mb = None
+        try:
+            fragment_size_mb, fragment_rows = self.get_fragment_settings()
+        except ValueError:
+            QMessageBox.warning(self, "Fragment Size Error", "Please enter a valid number for the fragment size.")
+            return
 
         if not output_folder:
             QMessageBox.warning(self, "Output Folder Error", "Please select an output folder.")
             return
 
+        # Snapshot the settings on the GUI thread so the worker only handles plain picklable jobs
+        try:
+            jobs = [file_config.to_job(output_folder, fragment_size_mb, fragment_rows) for file_config in self.file_configs.values()]
+        except ValueError as e:
+            QMessageBox.warning(self, "Derived Columns Error", str(e))
+            return
+
         self.progress_dialog = QProgressDialog("Converting files...", "Cancel", 0, len(self.file_configs), self)
         self.progress_dialog.setWindowModality(Qt.WindowModal)
         self.progress_dialog.setMinimumDuration(0)
         self.progress_dialog.setValue(0)
+        # Running jobs stop at their next chunk, CSV outputs keep a checkpoint to resume from
+        self.cancel_event = multiprocessing.Event()
+        self.progress_dialog.canceled.connect(self.cancel_event.set)
 
         self.signals = WorkerSignals()
         self.signals.progress.connect(self.update_progress)
+        self.signals.rows.connect(self.update_row_progress)
         self.signals.complete.connect(self.conversion_complete)
 
-        self.worker_thread = WorkerThread(self.file_configs, output_folder, fragment_size_mb, self.signals)
+        manifest = ConversionManifest.for_folder(output_folder) if self.skip_unchanged_checkbox.isChecked() else None
+        self.worker_thread = WorkerThread(jobs, self.workers_spin_box.value(), self.signals, manifest, self.cancel_event)
         self.worker_thread.start()
 
+    def save_watch_profile(self):
+        input_folder = self.input_line_edit.text()
+        output_folder = self.output_line_edit.text()
+        file_config = self.tab_widget.currentWidget()
+        if not input_folder or not output_folder or file_config is None:
+            QMessageBox.warning(self, "Watch Profile Error", "Please select the input folder, the output folder and a file whose settings the profile should use.")
+            return
+        try:
+            fragment_size_mb, fragment_rows = self.get_fragment_settings()
+            job = file_config.to_job(output_folder, fragment_size_mb, fragment_rows)
+        except ValueError as e:
+            QMessageBox.warning(self, "Watch Profile Error", f"Please check the fragment size and derived columns: {e}")
+            return
+        save_profile(input_folder, WatchProfile.from_job(job, output_folder))
+        QMessageBox.information(self, "Watch Profile Saved", f"Files landing in {input_folder} will be converted like {file_config.file_name} by:\npython -m conversor \"{input_folder}\" \"{output_folder}\" --watch")
+
     def update_progress(self, value, total):
+        if self.cancel_event.is_set():
+            return
+        self.progress_dialog.setMaximum(total)
         self.progress_dialog.setValue(value)
-        if self.progress_dialog.wasCanceled():
-            self.worker_thread.join(0)
 
-    def conversion_complete(self):
-        self.progress_dialog.setValue(len(self.file_configs))
-        QMessageBox.information(self, "Conversion Complete", "All files have been converted successfully.")
+    def update_row_progress(self, progress):
+        if self.cancel_event.is_set():
+            return
+        eta = progress['eta']
+        eta_text = time.strftime('%H:%M:%S', time.gmtime(eta)) if eta is not None else 'estimating...'
+        self.progress_dialog.setLabelText(f"Converting files...\n{progress['rows']:,} rows ({progress['rows_per_sec']:,.0f} rows/sec), time left {eta_text}")
+
+    def conversion_complete(self, skipped, failed):
+        if self.cancel_event.is_set():
+            QMessageBox.information(self, "Conversion Cancelled", "The conversion was cancelled. Converting again resumes CSV outputs from their last checkpoint.")
+            return
+        self.progress_dialog.setValue(self.progress_dialog.maximum())
+        if failed:
+            QMessageBox.warning(self, "Conversion Complete", f"{failed} file(s) failed to convert, see the log for details. Skipped {skipped} unchanged file(s).")
+        elif skipped:
+            QMessageBox.information(self, "Conversion Complete", f"All files have been converted successfully. Skipped {skipped} unchanged file(s).")
+        else:
+            QMessageBox.information(self, "Conversion Complete", "All files have been converted successfully.")
+
+    def closeEvent(self, event):
+        self.header_cache.save()
+        super().closeEvent(event)
 
     def merge_sheets(self):
         options = QFileDialog.Options()
-        files, _ = QFileDialog.getOpenFileNames(self, "Select Sheets to Merge", "", "Excel Files (*.xlsx *.xls);;All Files (*)", options=options)
+        files, _ = QFileDialog.getOpenFileNames(self, "Select Sheets to Merge", "", "Excel and CSV Files (*.xlsx *.xls *.csv *.csv.gz *.csv.bz2 *.csv.xz *.csv.zst);;All Files (*)", options=options)
         if files:
-            output_file, _ = QFileDialog.getSaveFileName(self, "Save Merged File As", "", "Excel Files (*.xlsx);;All Files (*)", options=options)
+            output_file, _ = QFileDialog.getSaveFileName(self, "Save Merged File As", "", "Excel Files (*.xlsx);;CSV Files (*.csv);;All Files (*)", options=options)
             if output_file:
                 try:
-                    merge_sheets(files, output_file)
-                    QMessageBox.information(self, "Merge Complete", f"All sheets merged successfully into {output_file}.")
+                    dialog = MergeOptionsDialog(self, merge_columns(files))
                 except Exception as e:
                     QMessageBox.critical(self, "Error", f"Failed to merge sheets: {e}")
+                    return
+                if dialog.exec_() != QDialog.Accepted:
+                    return
+
+                self.merge_progress_dialog = QProgressDialog("Merging sheets...", "Cancel", 0, 0, self)
+                self.merge_progress_dialog.setWindowModality(Qt.WindowModal)
+                self.merge_progress_dialog.setMinimumDuration(0)
+                # The merge stops at its next batch of rows and its partial output is removed
+                self.merge_cancel_event = threading.Event()
+                self.merge_progress_dialog.canceled.connect(self.merge_cancel_event.set)
+
+                self.merge_signals = MergeSignals()
+                self.merge_signals.complete.connect(self.merge_complete)
+                self.merge_signals.cancelled.connect(self.merge_cancelled)
+                self.merge_thread = MergeThread(files, output_file, dialog.get_options(), self.merge_signals, self.merge_cancel_event)
+                self.merge_thread.start()
+
+    def merge_complete(self, output_file, error):
+        self.merge_progress_dialog.reset()
+        if error:
+            QMessageBox.critical(self, "Error", f"Failed to merge sheets: {error}")
+        else:
+            QMessageBox.information(self, "Merge Complete", f"All sheets merged successfully into {output_file}.")
+
+    def merge_cancelled(self, output_file):
+        self.merge_progress_dialog.reset()
+        QMessageBox.information(self, "Merge Cancelled", f"The merge was cancelled, {output_file} was not written.")
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
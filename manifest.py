@@ -0,0 +1,130 @@
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import path_key, write_json
+
+MANIFEST_FILE_NAME = 'conversor_manifest.json'
+HASH_BLOCK_BYTES = 1024 * 1024
+
+def file_digest(file_path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def job_settings(job):
+    # Everything that shapes the output except the input path, which is the manifest key, and the
+    # number of parse processes, which only changes how fast it is written
+    settings = dataclasses.asdict(job)
+    del settings['input_file']
+    settings.pop('parse_workers', None)
+    return settings
+
+class ConversionManifest:
+    # Inputs converted into one output folder, keyed by input path, with the size, mtime and
+    # content hash they had, the job settings used and the outputs written. A job is skipped
+    # when all of those still match; a file that was only touched is recognised by its hash.
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.fingerprints = {}
+        self.load()
+
+    @classmethod
+    def for_folder(cls, output_folder):
+        return cls(os.path.join(output_folder, MANIFEST_FILE_NAME))
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get('entries', {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            logging.warning(f"Ignoring unreadable manifest {self.path}: {e}")
+            self.entries = {}
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            stored = {'entries': self.entries}
+            self.dirty = False
+        try:
+            write_json(self.path, stored, indent=1)
+        except OSError as e:
+            logging.warning(f"Could not save manifest {self.path}: {e}")
+
+    @staticmethod
+    def _key(file_path):
+        return path_key(file_path)
+
+    def _fingerprint(self, job):
+        # Taken before the conversion runs, so an input rewritten mid-conversion is redone next time
+        try:
+            stat = os.stat(job.input_file)
+        except OSError:
+            return None
+        entry = self.entries.get(self._key(job.input_file))
+        fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': None}
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            # Unchanged size and mtime are trusted, which keeps reruns over static folders free of reads
+            fingerprint['hash'] = entry['hash']
+        else:
+            fingerprint['hash'] = file_digest(job.input_file)
+        return fingerprint
+
+    def _is_current(self, job, fingerprint):
+        entry = self.entries.get(self._key(job.input_file))
+        return (
+            entry is not None
+            and entry['size'] == fingerprint['size']
+            and entry['hash'] == fingerprint['hash']
+            and entry['settings'] == job_settings(job)
+            and all(os.path.exists(output) for output in entry['outputs'])
+        )
+
+    def partition(self, jobs, max_workers=None):
+        # Returns (pending, skipped); inputs are hashed on a thread pool since hashlib releases the GIL
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            fingerprints = list(executor.map(self._fingerprint, jobs))
+
+        pending, skipped = [], []
+        for job, fingerprint in zip(jobs, fingerprints):
+            key = self._key(job.input_file)
+            if fingerprint is not None and self._is_current(job, fingerprint):
+                entry = self.entries[key]
+                if entry['mtime_ns'] != fingerprint['mtime_ns']:
+                    # Touched but identical: remember the new mtime so the next run skips the hash
+                    with self.lock:
+                        entry['mtime_ns'] = fingerprint['mtime_ns']
+                        self.dirty = True
+                skipped.append(job)
+            else:
+                # Forget the old entry so a conversion that fails halfway is not mistaken for current
+                with self.lock:
+                    if self.entries.pop(key, None) is not None:
+                        self.dirty = True
+                if fingerprint is not None:
+                    self.fingerprints[key] = fingerprint
+                pending.append(job)
+        if skipped:
+            logging.info(f"Skipping {len(skipped)} unchanged input(s) listed in {self.path}")
+        return pending, skipped
+
+    def record(self, job, outputs):
+        key = self._key(job.input_file)
+        fingerprint = self.fingerprints.pop(key, None)
+        if fingerprint is None:
+            return
+        with self.lock:
+            self.entries[key] = dict(fingerprint, settings=job_settings(job), outputs=list(outputs))
+            self.dirty = True
@@ -0,0 +1,146 @@
+import csv
+import hashlib
+import io
+import itertools
+import json
+import logging
+import mmap
+import os
+
+import numpy as np
+
+from header_cache import default_cache_dir
+from storage import path_key, write_json
+
+ROW_INDEX_STRIDE = 10000
+INDEX_BLOCK_BYTES = 16 * 1024 * 1024
+ROW_INDEX_DIR = 'row_index'
+
+def _row_ends(block, quote, inside):
+    # Offsets just past every newline of the block that is not inside a quoted field, and whether
+    # the block ends inside one. Escaped quotes ("") flip the parity twice, so they cancel out.
+    data = np.frombuffer(block, dtype=np.uint8)
+    newlines = np.flatnonzero(data == 10)
+    if block.find(quote) != -1:
+        quotes = np.flatnonzero(data == quote[0])
+        # Quotes before each newline, from its position in the sorted quote offsets
+        newlines = newlines[(np.searchsorted(quotes, newlines) + inside) % 2 == 0]
+        inside = (len(quotes) + inside) % 2
+    return newlines + 1, inside
+
+class CsvRowIndex:
+    # Byte offset of every stride-th data row of an uncompressed CSV, plus the exact row count.
+    # A page of rows anywhere in the file is read by seeking to the nearest indexed row and
+    # parsing at most one stride of rows before it. Newlines inside quoted fields are skipped.
+    def __init__(self, file_path, size, mtime_ns, quotechar, has_header, stride, rows, offsets):
+        self.file_path = file_path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.quotechar = quotechar
+        self.has_header = has_header
+        self.stride = stride
+        self.rows = rows
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, file_path, quotechar='"', has_header=True, stride=ROW_INDEX_STRIDE, cancel=None):
+        stat = os.stat(file_path)
+        quote = (quotechar or '"').encode('ascii')
+        skip = 1 if has_header else 0
+        offsets = []
+        starts = 1  # Physical rows started so far, the first one at offset 0
+        if not skip:
+            offsets.append(0)
+        with open(file_path, 'rb') as f:
+            if stat.st_size == 0:
+                return cls(file_path, 0, stat.st_mtime_ns, quotechar, has_header, stride, 0, [])
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                inside = 0
+                for position in range(0, stat.st_size, INDEX_BLOCK_BYTES):
+                    if cancel is not None and cancel.is_set():
+                        return None
+                    ends, inside = _row_ends(mm[position:position + INDEX_BLOCK_BYTES], quote, inside)
+                    ends += position
+                    if len(ends) and ends[-1] == stat.st_size:
+                        # A final newline ends the last row, it does not start another one
+                        ends = ends[:-1]
+                    # Data row of each new row start, keep the ones that fall on the stride
+                    data_rows = np.arange(starts, starts + len(ends)) - skip
+                    offsets.extend(ends[(data_rows >= 0) & (data_rows % stride == 0)].tolist())
+                    starts += len(ends)
+        rows = max(starts - skip, 0)
+        return cls(file_path, stat.st_size, stat.st_mtime_ns, quotechar, has_header, stride, rows, offsets)
+
+    def is_current(self):
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return False
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+    def byte_range(self, start_row, count):
+        # (byte_start, byte_end, rows to skip after byte_start) covering rows start_row..start_row+count
+        block = start_row // self.stride
+        end_block = (start_row + count - 1) // self.stride + 1
+        byte_end = self.offsets[end_block] if end_block < len(self.offsets) else self.size
+        return self.offsets[block], byte_end, start_row - block * self.stride
+
+    def read_rows(self, start_row, count, delimiter, encoding=None):
+        # Rows start_row..start_row+count as lists of strings, parsed from the indexed byte range only
+        start_row = max(0, min(start_row, self.rows))
+        count = min(count, self.rows - start_row)
+        if count <= 0:
+            return []
+        byte_start, byte_end, skip = self.byte_range(start_row, count)
+        with open(self.file_path, 'rb') as f:
+            f.seek(byte_start)
+            data = f.read(byte_end - byte_start)
+        text = data.decode('utf-8-sig' if encoding in (None, 'utf-8') else encoding, errors='replace')
+        reader = csv.reader(io.StringIO(text, newline=''), delimiter=delimiter, quotechar=self.quotechar or '"')
+        return list(itertools.islice(reader, skip, skip + count))
+
+    def to_dict(self):
+        return {
+            'size': self.size,
+            'mtime_ns': self.mtime_ns,
+            'quotechar': self.quotechar,
+            'has_header': self.has_header,
+            'stride': self.stride,
+            'rows': self.rows,
+            'offsets': self.offsets,
+        }
+
+def index_path(file_path, quotechar='"', has_header=True, cache_dir=None):
+    key = json.dumps([path_key(file_path), quotechar, has_header])
+    name = hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(cache_dir or default_cache_dir(), ROW_INDEX_DIR, f"{name}.json")
+
+def load_row_index(file_path, quotechar='"', has_header=True, cache_dir=None):
+    # Stored index of the file, or None when there is none or the file changed since
+    path = index_path(file_path, quotechar, has_header, cache_dir)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        index = CsvRowIndex(file_path, stored['size'], stored['mtime_ns'], stored['quotechar'], stored['has_header'], stored['stride'], stored['rows'], stored['offsets'])
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logging.warning(f"Ignoring unreadable row index {path}: {e}")
+        return None
+    return index if index.is_current() else None
+
+def save_row_index(index, cache_dir=None):
+    path = index_path(index.file_path, index.quotechar, index.has_header, cache_dir)
+    try:
+        write_json(path, index.to_dict())
+    except OSError as e:
+        logging.warning(f"Could not save row index {path}: {e}")
+
+def get_row_index(file_path, quotechar='"', has_header=True, stride=ROW_INDEX_STRIDE, cache_dir=None, cancel=None):
+    # Loads the stored index or builds and stores it in one scan of the file
+    index = load_row_index(file_path, quotechar, has_header, cache_dir)
+    if index is None or index.stride != stride:
+        index = CsvRowIndex.build(file_path, quotechar, has_header, stride, cancel)
+        if index is not None:
+            save_row_index(index, cache_dir)
+    return index
@@ -0,0 +1,18 @@
+import json
+import os
+
+def path_key(file_path):
+    # Key of a file in the caches, manifests and queues: absolute and case-folded where the
+    # file system ignores case, so one file always gets one entry
+    return os.path.normcase(os.path.abspath(file_path))
+
+def write_json(path, data, indent=None):
+    # Written to a temporary file next to path and renamed over it, so a crash mid-write never
+    # leaves a truncated file behind; raises OSError for the caller to report
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent)
+    os.replace(temp_path, path)
@@ -0,0 +1,405 @@
+import ctypes
+import ctypes.util
+import dataclasses
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import select
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+from functions import ConversionCancelled, ConversionJob, _init_worker, _run_worker_job, conversion_types_for, output_path_for
+from header_cache import default_cache_dir
+from manifest import ConversionManifest
+from storage import path_key, write_json
+
+WATCH_DIR = 'watch'
+PROFILE_FILE_NAME = 'profile.json'
+QUEUE_FILE_NAME = 'queue.json'
+SETTLE_SECONDS = 2.0  # A file is converted once its size and mtime stayed the same this long
+POLL_SECONDS = 2.0  # Rescan interval of the polling fallback
+WATCH_TICK = 0.5  # Seconds between checks of settling files and finished jobs
+WATCH_MAX_ATTEMPTS = 3  # Conversions of one file a dying worker may take down before it is given up
+WATCH_RETRY_SECONDS = 30  # Wait before the first retry after a worker died, doubled for each next one
+
+# inotify(7) event masks and the fixed part of struct inotify_event (wd, mask, cookie, len)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+INOTIFY_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+INOTIFY_EVENT = struct.Struct('iIII')
+INOTIFY_READ_BYTES = 64 * 1024
+
+def watch_dir(folder, cache_dir=None):
+    # Profile and queue of one watched folder live in the cache, never in the folder itself
+    name = hashlib.blake2b(path_key(folder).encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(cache_dir or default_cache_dir(), WATCH_DIR, name)
+
+@dataclass
+class WatchProfile:
+    # Conversion settings applied to every file landing in a watched folder
+    output_folder: str
+    target: str = None  # 'CSV', 'Excel', 'Parquet' or 'Arrow'; None converts by file extension
+    columns: list = None
+    delimiter: str = None  # None sniffs the dialect of each CSV
+    quotechar: str = None
+    has_header: bool = None  # None sniffs whether each CSV starts with a header row
+    excel_format: str = 'XLSX'
+    compression: str = None
+    compression_level: int = None
+    fragment_size_mb: float = None
+    fragment_rows: int = None
+    row_filter: str = None
+    derived_columns: dict = None
+
+    @classmethod
+    def from_job(cls, job, output_folder):
+        # Profile that converts like the given job, e.g. the settings of a tab in the GUI
+        source, target = job.conversion_type.split(' to ')
+        # The dialect of an Excel or JSON tab says nothing about CSV files, those are sniffed
+        is_csv = source == 'CSV'
+        return cls(
+            output_folder=output_folder,
+            target=target,
+            columns=job.selected_columns or None,
+            delimiter=job.delimiter if is_csv else None,
+            quotechar=(job.string_delimiter or None) if is_csv else None,
+            has_header=job.has_header if is_csv else None,
+            excel_format='XLS' if job.output_file.lower().endswith('.xls') else 'XLSX',
+            compression=job.compression,
+            compression_level=job.compression_level,
+            fragment_size_mb=job.fragment_size_mb,
+            fragment_rows=job.fragment_rows,
+            row_filter=job.row_filter,
+            derived_columns=job.derived_columns,
+        )
+
+    def to_job(self, input_file):
+        # None when the profile has no conversion for this kind of file
+        available = conversion_types_for(input_file)
+        if self.target:
+            available = [file_type for file_type in available if file_type.endswith(f" to {self.target}")]
+        if not available:
+            return None
+        return ConversionJob(
+            input_file=input_file,
+            output_file=output_path_for(input_file, self.output_folder, available[0], self.excel_format, self.compression),
+            conversion_type=available[0],
+            selected_columns=self.columns,
+            delimiter=self.delimiter,
+            string_delimiter=self.quotechar,
+            has_header=self.has_header,
+            compression=self.compression,
+            compression_level=self.compression_level,
+            fragment_size_mb=self.fragment_size_mb,
+            fragment_rows=self.fragment_rows,
+            row_filter=self.row_filter,
+            derived_columns=self.derived_columns,
+        )
+
+def load_profile(folder, cache_dir=None):
+    path = os.path.join(watch_dir(folder, cache_dir), PROFILE_FILE_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return WatchProfile(**json.load(f))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, TypeError) as e:
+        logging.warning(f"Ignoring unreadable watch profile {path}: {e}")
+        return None
+
+def save_profile(folder, profile, cache_dir=None):
+    path = os.path.join(watch_dir(folder, cache_dir), PROFILE_FILE_NAME)
+    try:
+        write_json(path, dataclasses.asdict(profile), indent=1)
+    except OSError as e:
+        logging.warning(f"Could not save watch profile {path}: {e}")
+
+class WatchQueue:
+    # Files waiting to be converted, saved after every change so a restart picks up where the last
+    # run stopped. Entries keep the size and mtime the file had when queued: a file that changes
+    # while it converts stays queued and is converted again.
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.load()
+
+    @classmethod
+    def for_folder(cls, folder, cache_dir=None):
+        return cls(os.path.join(watch_dir(folder, cache_dir), QUEUE_FILE_NAME))
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = {entry['path']: entry for entry in json.load(f).get('entries', [])}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logging.warning(f"Ignoring unreadable watch queue {self.path}: {e}")
+            self.entries = {}
+
+    def save(self):
+        try:
+            write_json(self.path, {'entries': list(self.entries.values())}, indent=1)
+        except OSError as e:
+            logging.warning(f"Could not save watch queue {self.path}: {e}")
+
+    def __len__(self):
+        return len(self.entries)
+
+    def put(self, file_path, stat):
+        entry = self.entries.get(file_path)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return
+        self.entries[file_path] = {'path': file_path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'queued': time.time()}
+        self.save()
+
+    def next(self, running):
+        # Oldest entry that is not converting right now nor waiting to be retried
+        now = time.time()
+        for file_path, entry in self.entries.items():
+            if file_path not in running and entry.get('retry_at', 0) <= now:
+                return dict(entry)
+        return None
+
+    def retry(self, entry, delay):
+        # Keeps the converted version queued for another attempt after delay seconds
+        current = self.entries.get(entry['path'])
+        if current is not None and current['size'] == entry['size'] and current['mtime_ns'] == entry['mtime_ns']:
+            current['attempts'] = entry.get('attempts', 0) + 1
+            current['retry_at'] = time.time() + delay
+            self.save()
+
+    def remove(self, entry):
+        # Only the version that was converted, a newer one queued meanwhile stays
+        current = self.entries.get(entry['path'])
+        if current is not None and current['size'] == entry['size'] and current['mtime_ns'] == entry['mtime_ns']:
+            del self.entries[entry['path']]
+            self.save()
+
+class PollingWatcher:
+    # Rescans the folder every interval and reports files whose size or mtime changed
+    def __init__(self, folder, interval=POLL_SECONDS):
+        self.folder = folder
+        self.interval = interval
+        self.seen = self._scan()
+        self.next_scan = time.monotonic() + interval
+
+    def _scan(self):
+        seen = {}
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file():
+                            stat = entry.stat()
+                            seen[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                    except OSError:
+                        pass
+        except OSError as e:
+            logging.warning(f"Could not scan {self.folder}: {e}")
+        return seen
+
+    def changes(self, timeout):
+        wait = self.next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(wait, 0))
+        self.next_scan = time.monotonic() + self.interval
+        seen, self.seen = self.seen, self._scan()
+        return [path for path, state in self.seen.items() if seen.get(path) != state]
+
+    def close(self):
+        pass
+
+class InotifyWatcher:
+    # Linux inotify through libc, so no extra package is needed. changes() returns None when the
+    # kernel queue overflowed and events were lost; the caller then rescans the folder.
+    def __init__(self, folder):
+        self.folder = folder
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), INOTIFY_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {folder}")
+
+    def changes(self, timeout):
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, INOTIFY_READ_BYTES)
+        except BlockingIOError:
+            return []
+        changed = set()
+        position = 0
+        while position < len(data):
+            _, mask, _, length = INOTIFY_EVENT.unpack_from(data, position)
+            position += INOTIFY_EVENT.size
+            if mask & IN_Q_OVERFLOW:
+                return None
+            name = data[position:position + length].rstrip(b'\0')
+            position += length
+            if name:
+                changed.add(os.path.join(self.folder, os.fsdecode(name)))
+        return list(changed)
+
+    def close(self):
+        os.close(self.fd)
+
+def open_watcher(folder, polling=False):
+    if not polling:
+        try:
+            return InotifyWatcher(folder)
+        except (OSError, AttributeError) as e:
+            # No inotify (Windows, macOS) or no watches left: fall back to rescanning
+            logging.info(f"Watching {folder} by polling every {POLL_SECONDS:g}s ({e})")
+    return PollingWatcher(folder)
+
+def is_watched(file_path):
+    # Hidden files and Office lock files (~$book.xlsx) are never inputs
+    name = os.path.basename(file_path)
+    return not name.startswith(('.', '~$')) and bool(conversion_types_for(name))
+
+def list_inputs(folder):
+    try:
+        names = sorted(os.listdir(folder))
+    except OSError as e:
+        logging.warning(f"Could not list {folder}: {e}")
+        return []
+    return [os.path.join(folder, name) for name in names if is_watched(name)]
+
+class SettlingFiles:
+    # Files seen changing, reported once their size and mtime stayed the same for settle seconds,
+    # so a file that is still being copied in is not converted half-written
+    def __init__(self, settle_seconds=SETTLE_SECONDS):
+        self.settle_seconds = settle_seconds
+        self.files = {}  # path -> (size, mtime_ns, unchanged since)
+
+    def __len__(self):
+        return len(self.files)
+
+    def touch(self, file_path):
+        self.files.setdefault(file_path, (None, None, time.monotonic()))
+
+    def ready(self):
+        now = time.monotonic()
+        settled = []
+        for file_path, (size, mtime_ns, since) in list(self.files.items()):
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                del self.files[file_path]  # Removed or renamed away before it settled
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                self.files[file_path] = (stat.st_size, stat.st_mtime_ns, now)
+            elif now - since >= self.settle_seconds:
+                del self.files[file_path]
+                settled.append((file_path, stat))
+        return settled
+
+def watch_folder(folder, profile, max_workers=None, stop=None, settle_seconds=SETTLE_SECONDS, polling=False, cache_dir=None):
+    # Converts files landing in folder with the profile until stop is set. Files already in the
+    # folder are checked on start, and the output folder's manifest skips the ones converted before.
+    if path_key(folder) == path_key(profile.output_folder):
+        raise ValueError("The output folder must differ from the watched folder, outputs would be converted again")
+    os.makedirs(profile.output_folder, exist_ok=True)
+    stop = stop or multiprocessing.Event()
+    max_workers = max_workers or os.cpu_count() or 1
+    queue = WatchQueue.for_folder(folder, cache_dir)
+    manifest = ConversionManifest.for_folder(profile.output_folder)
+    settling = SettlingFiles(settle_seconds)
+    cancel = multiprocessing.Event()
+    running = {}  # future -> queue entry
+    pool = {'executor': None, 'broken': False}
+    if queue:
+        logging.info(f"Resuming {len(queue)} queued file(s) of {folder}")
+
+    def new_executor():
+        return ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(None, cancel))
+
+    def start_next():
+        entry = queue.next({entry['path'] for entry in running.values()})
+        if entry is None:
+            return False
+        job = profile.to_job(entry['path']) if os.path.exists(entry['path']) else None
+        pending = manifest.partition([job])[0] if job is not None else []
+        if not pending:
+            queue.remove(entry)
+            return True
+        try:
+            running[pool['executor'].submit(_run_worker_job, job)] = dict(entry, job=job)
+        except BrokenProcessPool:
+            pool['broken'] = True  # Stays queued, it runs on the next pool
+            return False
+        return True
+
+    def finish(future):
+        entry = running.pop(future)
+        job = entry.pop('job')
+        name = os.path.basename(job.input_file)
+        error = future.exception()
+        if isinstance(error, (ConversionCancelled, KeyboardInterrupt)):
+            return  # Stays queued for the next run; Ctrl+C in a terminal also interrupts the workers
+        if isinstance(error, BrokenProcessPool):
+            # A worker died (killed for memory, crashed): every job it shared the pool with fails the
+            # same way, so this need not be the file's fault. Retry later, up to a limit.
+            pool['broken'] = True
+            attempts = entry.get('attempts', 0) + 1
+            if attempts < WATCH_MAX_ATTEMPTS:
+                delay = WATCH_RETRY_SECONDS * 2 ** (attempts - 1)
+                logging.warning(f"Worker converting {name} died, retrying in {delay}s (attempt {attempts} of {WATCH_MAX_ATTEMPTS})")
+                queue.retry(entry, delay)
+                return
+            logging.error(f"Giving up on {name}: its worker died {attempts} times")
+        elif error is not None:
+            logging.error(f"Failed to convert {os.path.basename(job.input_file)}: {error}")
+        else:
+            manifest.record(job, future.result())
+            manifest.save()
+            logging.info(f"Converted {name} {time.time() - entry['queued']:.1f}s after it was queued")
+        queue.remove(entry)
+
+    for file_path in list_inputs(folder):
+        settling.touch(file_path)
+    watcher = open_watcher(folder, polling)
+    logging.info(f"Watching {folder}, converting into {profile.output_folder} with {max_workers} worker(s)")
+    pool['executor'] = new_executor()
+    try:
+        while not stop.is_set():
+            changed = watcher.changes(WATCH_TICK)
+            for file_path in list_inputs(folder) if changed is None else changed:
+                if is_watched(file_path):
+                    settling.touch(file_path)
+            for file_path, stat in settling.ready():
+                queue.put(file_path, stat)
+            for future in [future for future in running if future.done()]:
+                finish(future)
+            if pool['broken'] and not running:
+                logging.warning("A conversion worker died, starting a new worker pool")
+                pool['executor'].shutdown(wait=False)
+                pool['executor'], pool['broken'] = new_executor(), False
+            while not pool['broken'] and len(running) < max_workers and start_next():
+                pass
+        # Running jobs stop at their next chunk; CSV outputs keep a checkpoint to resume from
+        cancel.set()
+        for future in list(running):
+            future.exception()
+            finish(future)
+    finally:
+        pool['executor'].shutdown(wait=True)
+        watcher.close()
+        manifest.save()
+    logging.info(f"Stopped watching {folder}, {len(queue)} file(s) left in the queue")
+    return len(queue)